@@ -1,31 +1,136 @@
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_to_dict, messages_from_dict
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_openai import ChatOpenAI
 from app.agents.state import AgentState
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 from langchain_core.tools import BaseTool
+from app.agents.budget import AgentBudget, estimate_tokens, new_usage
+from app.agents.cache import cache_key_for, llm_cache
+from app.agents.deadline import DeadlineExceeded, check_deadline, degraded_answer, run_with_deadline
 
 class BaseAgent:
     def __init__(self, name: str, model: ChatOpenAI, system_prompt: str, tools: List[BaseTool] = []):
         self.name = name
+        self.llm = model
         self.model = model
         self.system_prompt = system_prompt
         self.tools = tools
-        
+
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", self.system_prompt),
             MessagesPlaceholder(variable_name="messages"),
         ])
-        
+
         if self.tools:
             self.model = self.model.bind_tools(self.tools)
-            
+
         self.runnable = self.prompt | self.model
 
-    def __call__(self, state: AgentState):
+        # 工具循环的预算：用尽后禁止调用工具，基于已有信息给出最终回答
+        self.budget = AgentBudget.for_agent(self.name) if self.tools else None
+        if self.tools:
+            self.final_runnable = ChatPromptTemplate.from_messages([
+                ("system", self.system_prompt),
+                MessagesPlaceholder(variable_name="messages"),
+                ("system", "本轮的工具调用预算已用尽。不要再调用工具，请根据以上已有的信息直接给出最终回答。"),
+            ]) | self.llm.bind_tools(self.tools, tool_choice="none")
+        self.cache = llm_cache if llm_cache.enabled_for(self.name) else None
+
+    def __call__(self, state: AgentState, config: Optional[RunnableConfig] = None):
         """
         Entry point for the graph node.
         """
         messages = state["messages"]
-        response = self.runnable.invoke({"messages": messages})
-        return {"messages": [response]}
+        usage, exhausted = self._check_budget(state)
+        key = None if exhausted else self._cache_key(messages)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return {"messages": [cached]}
+
+        try:
+            check_deadline(state)
+        except DeadlineExceeded:
+            return {"messages": [degraded_answer(messages)]}
+
+        runnable = self.final_runnable if exhausted else self.runnable
+        response = runnable.invoke({"messages": messages}, config)
+        return self._finish(state, messages, key, response, usage, exhausted)
+
+    async def ainvoke(self, state: AgentState, config: Optional[RunnableConfig] = None):
+        """
+        Async entry point for the graph node (used by graph.ainvoke / astream_events).
+        """
+        messages = state["messages"]
+        usage, exhausted = self._check_budget(state)
+        key = None if exhausted else self._cache_key(messages)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return {"messages": [cached]}
+
+        runnable = self.final_runnable if exhausted else self.runnable
+        try:
+            # LLM调用只能使用请求剩余的时间
+            response = await run_with_deadline(
+                runnable.ainvoke({"messages": messages}, config), state
+            )
+        except DeadlineExceeded:
+            return {"messages": [degraded_answer(messages)]}
+
+        return self._finish(state, messages, key, response, usage, exhausted)
+
+    def as_node(self) -> RunnableLambda:
+        """包装为同时支持同步和异步调用的Graph节点"""
+        return RunnableLambda(self, afunc=self.ainvoke)
+
+    def _check_budget(self, state: AgentState) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """读取本Agent本轮的用量，返回(用量, 预算是否已用尽)；没有工具的Agent不受预算限制"""
+        if self.budget is None:
+            return None, False
+        usage = dict((state.get("budget_usage") or {}).get(self.name) or new_usage())
+        reason = self.budget.exhausted(usage)
+        if reason is not None:
+            print(f"⛔ {self.name} budget exhausted ({reason}), forcing final answer")
+        return usage, reason is not None
+
+    def _finish(
+        self,
+        state: AgentState,
+        messages: List[BaseMessage],
+        key: Optional[str],
+        response: BaseMessage,
+        usage: Optional[Dict[str, Any]],
+        exhausted: bool
+    ) -> dict:
+        """缓存回答并更新预算用量，返回节点输出"""
+        if exhausted and getattr(response, "tool_calls", None):
+            # 兼容接口可能忽略tool_choice：丢弃工具调用，保证循环结束
+            response = AIMessage(content=response.content)
+        self._cache_set(key, response)
+        if usage is None:
+            return {"messages": [response]}
+
+        usage["tokens"] += estimate_tokens(self.llm.model_name, self.system_prompt, messages, response)
+        if getattr(response, "tool_calls", None):
+            usage["iterations"] += 1
+        return {
+            "messages": [response],
+            "budget_usage": {**(state.get("budget_usage") or {}), self.name: usage}
+        }
+
+    def _cache_key(self, messages: List[BaseMessage]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return cache_key_for(self.llm, self.system_prompt, messages, self.tools)
+
+    def _cache_get(self, key: Optional[str]) -> Optional[BaseMessage]:
+        if key is None:
+            return None
+        data = self.cache.get(key, agent_name=self.name)
+        return messages_from_dict([data])[0] if data is not None else None
+
+    def _cache_set(self, key: Optional[str], response: BaseMessage) -> None:
+        # 只缓存最终回答：工具调用的结果依赖外部状态，不能复用
+        if key is None or getattr(response, "tool_calls", None):
+            return
+        self.cache.set(key, message_to_dict(response))
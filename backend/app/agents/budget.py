@@ -0,0 +1,76 @@
+"""
+Agent预算 - 限制工具调用循环的成本和耗时
+
+researcher / coder 与各自的工具节点构成循环，模型持续返回 tool_calls 时
+会一直调用LLM和工具，直到触发LangGraph的递归上限报错。
+每个Agent在一轮对话中的用量记录在 AgentState["budget_usage"] 中：
+- iterations: 已执行的工具调用轮数
+- tokens: 累计消耗的token（API未返回用量时按tiktoken估算）
+- started_at: 该Agent本轮第一次被调用的时间
+
+任一预算用尽时，Agent不再绑定可调用的工具，基于已有信息直接给出最终回答。
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+
+from app.core.config import settings
+
+
+@dataclass
+class AgentBudget:
+    """一个Agent每轮对话的预算（<=0表示不限制）"""
+    max_tool_iterations: int = 5
+    max_tokens: int = 50000
+    max_seconds: float = 90
+
+    @classmethod
+    def for_agent(cls, name: str) -> "AgentBudget":
+        """读取配置：AGENT_BUDGETS中该Agent的设置覆盖默认值"""
+        overrides = settings.AGENT_BUDGETS.get(name, {})
+        return cls(
+            max_tool_iterations=overrides.get("max_tool_iterations", settings.AGENT_MAX_TOOL_ITERATIONS),
+            max_tokens=overrides.get("max_tokens", settings.AGENT_MAX_TOKENS),
+            max_seconds=overrides.get("max_seconds", settings.AGENT_MAX_SECONDS),
+        )
+
+    def exhausted(self, usage: Dict[str, Any]) -> Optional[str]:
+        """返回用尽的预算（用于日志），未用尽返回None"""
+        if 0 < self.max_tool_iterations <= usage["iterations"]:
+            return f"tool iterations {usage['iterations']}/{self.max_tool_iterations}"
+        if 0 < self.max_tokens <= usage["tokens"]:
+            return f"tokens {usage['tokens']}/{self.max_tokens}"
+        elapsed = time.time() - usage["started_at"]
+        if 0 < self.max_seconds <= elapsed:
+            return f"wall time {elapsed:.1f}s/{self.max_seconds:.0f}s"
+        return None
+
+
+def new_usage() -> Dict[str, Any]:
+    """Agent本轮的初始用量"""
+    return {"iterations": 0, "tokens": 0, "started_at": time.time()}
+
+
+def estimate_tokens(
+    model_name: str,
+    system_prompt: str,
+    messages: Sequence[BaseMessage],
+    response: Optional[BaseMessage] = None
+) -> int:
+    """
+    一次LLM调用消耗的token
+
+    优先使用API返回的用量；没有时按提示词（+ 回答）估算
+    """
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") if response else None
+    if usage and usage.get("total_tokens"):
+        return usage["total_tokens"]
+
+    from app.services.context import count_message_tokens, count_tokens
+    tokens = count_tokens(system_prompt, model_name)
+    tokens += sum(count_message_tokens(m, model_name) for m in messages)
+    if response is not None:
+        tokens += count_tokens(str(response.content), model_name)
+    return tokens
@@ -0,0 +1,229 @@
+"""
+LLM响应缓存 - 精确匹配
+
+缓存键 = hash(模型, 温度, 系统提示词, 消息列表, 绑定的工具)，
+所有Agent都使用 temperature=0，相同输入的输出可以安全复用。
+
+- 内存 LRU + TTL
+- 可选 SQLite 持久化（data/ 目录下），写入交给后台队列
+- 按Agent开关，按Agent统计命中/未命中
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.tools import BaseTool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _message_fingerprint(message: BaseMessage) -> Dict[str, Any]:
+    """消息中影响模型输出的部分（忽略id、token用量等元数据）"""
+    fingerprint: Dict[str, Any] = {"type": message.type, "content": message.content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        fingerprint["tool_calls"] = [
+            {"name": call.get("name"), "args": call.get("args")} for call in tool_calls
+        ]
+    tool_call_id = getattr(message, "tool_call_id", None)
+    if tool_call_id:
+        fingerprint["tool_call_id"] = tool_call_id
+    return fingerprint
+
+
+def make_cache_key(
+    model: str,
+    temperature: Optional[float],
+    system_prompt: str,
+    messages: Sequence[BaseMessage],
+    tools: Sequence[BaseTool] = (),
+    extra: Optional[Dict[str, Any]] = None
+) -> str:
+    """计算缓存键"""
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "system_prompt": system_prompt,
+        "messages": [_message_fingerprint(m) for m in messages],
+        "tools": [{"name": t.name, "description": t.description, "args": t.args} for t in tools],
+        "extra": extra or {},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """LLM响应缓存（内存LRU + TTL，可选SQLite持久化）"""
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl_seconds: float = 3600,
+        enabled_agents: Sequence[str] = (),
+        persist_path: Optional[str] = None
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled_agents = set(enabled_agents)
+        self.persist_path = persist_path
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._generation = 0  # 每次clear加一，清空前排队的持久化写入不再生效
+
+        if self.persist_path:
+            self._init_persistence()
+
+    def enabled_for(self, agent_name: str) -> bool:
+        """该Agent是否启用缓存"""
+        return settings.LLM_CACHE_ENABLED and agent_name in self.enabled_agents
+
+    def get(self, key: str, agent_name: str = "default") -> Optional[Any]:
+        """读取缓存（过期条目视为未命中）"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats[agent_name]["hits"] += 1
+                    return json.loads(value)
+                del self._entries[key]
+
+        value = self._load(key, now) if self.persist_path else None
+
+        with self._lock:
+            if value is None:
+                self._stats[agent_name]["misses"] += 1
+                return None
+            self._stats[agent_name]["hits"] += 1
+            self._put(key, value, now + self.ttl_seconds)
+
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """写入缓存（value需可JSON序列化）"""
+        raw = json.dumps(value, ensure_ascii=False, default=str)
+        expires_at = time.time() + self.ttl_seconds
+
+        with self._lock:
+            self._put(key, raw, expires_at)
+            generation = self._generation
+
+        if self.persist_path:
+            from app.services.background import background_queue
+            background_queue.submit(self._store, key, raw, expires_at, generation)
+
+    def clear(self) -> None:
+        """清空缓存（内存和持久化部分）和统计"""
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            self._generation += 1
+
+        if self.persist_path:
+            conn = sqlite3.connect(self.persist_path)
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            agents = {name: dict(counts) for name, counts in self._stats.items()}
+            size = len(self._entries)
+
+        hits = sum(a["hits"] for a in agents.values())
+        misses = sum(a["misses"] for a in agents.values())
+        return {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "enabled_agents": sorted(self.enabled_agents),
+            "size": size,
+            "max_size": self.max_size,
+            "persistent": bool(self.persist_path),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "agents": agents,
+        }
+
+    def _put(self, key: str, value: str, expires_at: float) -> None:
+        """写入内存并按LRU淘汰（调用方需持有锁）"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _init_persistence(self) -> None:
+        Path(self.persist_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.persist_path)
+        conn.execute('''CREATE TABLE IF NOT EXISTS llm_cache
+                        (key TEXT PRIMARY KEY,
+                         value TEXT NOT NULL,
+                         expires_at REAL NOT NULL)''')
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+        conn.close()
+
+    def _load(self, key: str, now: float) -> Optional[str]:
+        try:
+            conn = sqlite3.connect(self.persist_path)
+            row = conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            conn.close()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  LLM cache lookup failed: {e}")
+            return None
+
+    def _store(self, key: str, value: str, expires_at: float, generation: int) -> None:
+        if generation != self._generation:
+            # 写入之前缓存已被清空
+            return
+        conn = sqlite3.connect(self.persist_path)
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at)
+        )
+        conn.commit()
+        conn.close()
+
+
+def _model_identity(model: Any) -> Tuple[str, Optional[float]]:
+    """获取模型名称和温度"""
+    name = getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
+    return str(name), getattr(model, "temperature", None)
+
+
+def cache_key_for(
+    model: Any,
+    system_prompt: str,
+    messages: List[BaseMessage],
+    tools: Sequence[BaseTool] = (),
+    extra: Optional[Dict[str, Any]] = None
+) -> str:
+    """根据Agent的模型配置计算缓存键"""
+    name, temperature = _model_identity(model)
+    return make_cache_key(name, temperature, system_prompt, messages, tools, extra)
+
+
+# 单例实例（全局使用）
+llm_cache = LLMResponseCache(
+    max_size=settings.LLM_CACHE_MAX_SIZE,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+    enabled_agents=settings.LLM_CACHE_AGENTS,
+    persist_path=settings.LLM_CACHE_DB_PATH if settings.LLM_CACHE_PERSIST else None
+)
@@ -0,0 +1,93 @@
+"""
+请求截止时间（deadline）
+
+截止时间是绝对时间戳，随 AgentState 在节点间传递；
+每次LLM调用和工具调用只能使用剩余的时间，超时后返回降级的部分回答，
+而不是让请求无限期占用worker。
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Mapping, Optional, Sequence, TypeVar
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# 降级回答中每个工具结果保留的最大字符数
+_PARTIAL_RESULT_CHARS = 1500
+
+
+class DeadlineExceeded(Exception):
+    """请求的截止时间已到"""
+
+
+def make_deadline(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    根据超时时间（秒）计算截止时间
+
+    未指定时使用REQUEST_TIMEOUT_SECONDS，并限制在REQUEST_TIMEOUT_MAX_SECONDS以内；
+    超时时间<=0表示不限制（只能通过配置关闭，请求头的值在接口层校验）
+    """
+    if timeout is None:
+        timeout = settings.REQUEST_TIMEOUT_SECONDS
+    if timeout <= 0:
+        return None
+    return time.time() + min(timeout, settings.REQUEST_TIMEOUT_MAX_SECONDS)
+
+
+def remaining(state: Mapping[str, Any]) -> Optional[float]:
+    """剩余时间（秒），没有截止时间时返回None"""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return None
+    return max(deadline - time.time(), 0.0)
+
+
+def check_deadline(state: Mapping[str, Any]) -> None:
+    """截止时间已到时抛出DeadlineExceeded（用于同步调用前的检查）"""
+    budget = remaining(state)
+    if budget is not None and budget <= 0:
+        raise DeadlineExceeded()
+
+
+async def run_with_deadline(awaitable: Awaitable[T], state: Mapping[str, Any]) -> T:
+    """在剩余时间内等待awaitable，超时则取消并抛出DeadlineExceeded"""
+    budget = remaining(state)
+    if budget is None:
+        return await awaitable
+    if budget <= 0:
+        # 不再启动新的调用
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(awaitable, timeout=budget)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
+
+
+def degraded_answer(messages: Sequence[BaseMessage]) -> AIMessage:
+    """
+    超时后的降级回答：汇总本轮已经拿到的工具结果
+
+    只看最后一条用户消息之后的工具输出（之前的属于历史对话）
+    """
+    results = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage) and message.content:
+            content = str(message.content)
+            if len(content) > _PARTIAL_RESULT_CHARS:
+                content = content[:_PARTIAL_RESULT_CHARS] + "..."
+            results.append(content)
+    results.reverse()
+
+    if results:
+        content = "⚠️ 处理超时，未能完成完整回答。以下是已获取的部分结果：\n\n" + "\n\n---\n\n".join(results)
+    else:
+        content = "⚠️ 抱歉，处理超时，未能完成回答。请稍后重试或简化问题。"
+
+    return AIMessage(content=content, additional_kwargs={"degraded": True})
@@ -0,0 +1,248 @@
+"""
+向量路由 - 基于 route_history 的本地分类器
+
+把历史路由决策中的用户消息向量化，构建索引；新消息向量化后：
+- knn: 取余弦相似度最高的k条历史消息，按相似度加权投票
+- centroid: 与每个路由的中心向量比较，softmax得到置信度
+
+打分是一次NumPy矩阵乘法（毫秒级），置信度低于阈值时交给LLM路由。
+索引定期在后台重建；历史消息的向量按文本缓存，重建时只向量化新增消息。
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 决策来源为这些值的记录可作为训练样本（NULL为早期的LLM决策，另外包括级联路由的 llm:<模型>）；
+# 向量路由自己的决策不参与训练，避免自我强化
+_TRAINING_SOURCES = ("llm", "rule")
+_ROUTES = ("researcher", "coder", "general_assistant")
+
+
+@dataclass
+class EmbeddingMatch:
+    """向量路由的结果"""
+    route: str
+    confidence: float
+    reasoning: str
+
+
+@dataclass
+class _RouteIndex:
+    routes: List[str]
+    labels: np.ndarray  # (n,) 每条样本的路由下标
+    vectors: np.ndarray  # (n, d) 归一化后的样本向量
+    centroids: np.ndarray  # (r, d) 归一化后的路由中心
+    built_at: float
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingRouter:
+    """基于历史路由决策的向量分类器"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        method: str = "knn",
+        k: int = 15,
+        threshold: float = 0.8,
+        min_similarity: float = 0.75,
+        min_examples: int = 50,
+        max_examples: int = 5000,
+        rebuild_interval: float = 3600
+    ):
+        self.enabled = enabled
+        self.method = method
+        self.k = k
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self.min_examples = min_examples
+        self.max_examples = max_examples
+        self.rebuild_interval = rebuild_interval
+
+        self._index: Optional[_RouteIndex] = None
+        self._embeddings = None
+        self._vector_cache: Dict[str, np.ndarray] = {}  # 消息文本 -> 向量
+        self._rebuilding = threading.Lock()
+        self._last_attempt = 0.0
+
+        # 统计信息
+        self.hits = 0
+        self.fallbacks = 0
+        self.rebuilds = 0
+
+    def classify(self, text: str) -> Optional[EmbeddingMatch]:
+        """同步分类（索引未就绪或置信度不足时返回None）"""
+        if not self._ready():
+            return None
+        query = np.asarray(self._get_embeddings().embed_query(text), dtype=np.float32)
+        return self._score(query)
+
+    async def aclassify(self, text: str) -> Optional[EmbeddingMatch]:
+        """异步分类（索引未就绪或置信度不足时返回None）"""
+        if not self._ready():
+            return None
+        query = np.asarray(await self._get_embeddings().aembed_query(text), dtype=np.float32)
+        return self._score(query)
+
+    def rebuild(self) -> bool:
+        """从route_history重建索引（同一时间只有一个重建）"""
+        if not self._rebuilding.acquire(blocking=False):
+            return False
+        try:
+            self._last_attempt = time.time()
+            examples = self._load_examples()
+            if len(examples) < self.min_examples:
+                logger.info(f"⏳ Embedding router: {len(examples)} examples, need {self.min_examples}")
+                return False
+
+            missing = [text for text, _ in examples if text not in self._vector_cache]
+            for start in range(0, len(missing), 256):
+                batch = missing[start:start + 256]
+                for text, vector in zip(batch, self._get_embeddings().embed_documents(batch)):
+                    self._vector_cache[text] = np.asarray(vector, dtype=np.float32)
+
+            # 只保留仍在样本中的向量
+            texts = {text for text, _ in examples}
+            self._vector_cache = {t: v for t, v in self._vector_cache.items() if t in texts}
+
+            routes = sorted({route for _, route in examples})
+            route_ids = {route: i for i, route in enumerate(routes)}
+            vectors = _normalize(np.stack([self._vector_cache[text] for text, _ in examples]))
+            labels = np.array([route_ids[route] for _, route in examples])
+            centroids = _normalize(np.stack([vectors[labels == i].mean(axis=0) for i in range(len(routes))]))
+
+            self._index = _RouteIndex(
+                routes=routes, labels=labels, vectors=vectors,
+                centroids=centroids, built_at=time.time()
+            )
+            self.rebuilds += 1
+            logger.info(f"✅ Embedding router index rebuilt: {len(examples)} examples, {len(routes)} routes")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to rebuild embedding router index: {e}")
+            return False
+        finally:
+            self._rebuilding.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        total = self.hits + self.fallbacks
+        index = self._index
+        return {
+            "enabled": self.enabled,
+            "method": self.method,
+            "examples": len(index.labels) if index is not None else 0,
+            "built_at": index.built_at if index is not None else None,
+            "rebuilds": self.rebuilds,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _ready(self) -> bool:
+        """索引是否可用；过期或缺失时在后台重建（不阻塞当前请求）"""
+        if not self.enabled:
+            return False
+        if time.time() - self._last_attempt >= self.rebuild_interval:
+            self._last_attempt = time.time()
+            self._schedule_rebuild()
+        return self._index is not None
+
+    def _schedule_rebuild(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            threading.Thread(target=self.rebuild, daemon=True).start()
+            return
+        loop.run_in_executor(None, self.rebuild)
+
+    def _score(self, query: np.ndarray) -> Optional[EmbeddingMatch]:
+        index = self._index
+        query = _normalize(query)
+
+        if self.method == "centroid":
+            sims = index.centroids @ query
+            best = int(np.argmax(sims))
+            # 相似度差异很小，softmax使用较低的温度
+            weights = np.exp((sims - sims[best]) / 0.05)
+            confidence = float(weights[best] / weights.sum())
+            top_similarity = float(sims[best])
+        else:
+            sims = index.vectors @ query
+            k = min(self.k, len(sims))
+            top = np.argpartition(-sims, k - 1)[:k]
+            votes = np.bincount(index.labels[top], weights=np.maximum(sims[top], 0), minlength=len(index.routes))
+            best = int(np.argmax(votes))
+            confidence = float(votes[best] / votes.sum()) if votes.sum() > 0 else 0.0
+            top_similarity = float(sims[top].max())
+
+        if confidence < self.threshold or top_similarity < self.min_similarity:
+            self.fallbacks += 1
+            return None
+
+        self.hits += 1
+        route = index.routes[best]
+        return EmbeddingMatch(
+            route=route,
+            confidence=confidence,
+            reasoning=f"向量路由({self.method}): 置信度{confidence:.2f}, 最高相似度{top_similarity:.2f}"
+        )
+
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            from app.services.vector_store import vector_store_service
+            self._embeddings = vector_store_service.embeddings
+        return self._embeddings
+
+    def _load_examples(self) -> List[tuple]:
+        """读取最近的路由决策作为样本（同一条消息只保留最新的决策）"""
+        from app.api.v1.endpoints.router_monitor import DB_PATH
+
+        sources = ",".join("?" * len(_TRAINING_SOURCES))
+        routes = ",".join("?" * len(_ROUTES))
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute(f"""
+            SELECT user_message, routed_to
+            FROM route_history
+            WHERE (decided_by IS NULL OR decided_by IN ({sources}) OR decided_by LIKE 'llm:%')
+              AND routed_to IN ({routes})
+              AND user_message IS NOT NULL AND user_message != ''
+            ORDER BY id DESC
+            LIMIT ?
+        """, (*_TRAINING_SOURCES, *_ROUTES, self.max_examples * 2)).fetchall()
+        conn.close()
+
+        examples: Dict[str, str] = {}
+        for text, route in rows:
+            if text not in examples:
+                examples[text] = route
+            if len(examples) >= self.max_examples:
+                break
+        return list(examples.items())
+
+
+# 单例实例（所有模型的Router共享）
+embedding_router = EmbeddingRouter(
+    enabled=settings.ROUTER_EMBEDDING_ENABLED,
+    method=settings.ROUTER_EMBEDDING_METHOD,
+    k=settings.ROUTER_EMBEDDING_K,
+    threshold=settings.ROUTER_EMBEDDING_THRESHOLD,
+    min_similarity=settings.ROUTER_EMBEDDING_MIN_SIMILARITY,
+    min_examples=settings.ROUTER_EMBEDDING_MIN_EXAMPLES,
+    max_examples=settings.ROUTER_EMBEDDING_MAX_EXAMPLES,
+    rebuild_interval=settings.ROUTER_EMBEDDING_REBUILD_INTERVAL
+)
@@ -9,76 +9,45 @@ LangGraph 工作流定义 - 多Agent路由系统
     ├─→ Researcher → Tools (搜索) → Researcher → END
     ├─→ Coder → Tools (代码执行) → Coder → END  
     └─→ General → END
+
+开启投机执行（ROUTER_SPECULATIVE_ENABLED）时，Router节点同时运行General，
+路由到General时直接结束（见 app.agents.speculative）
 """
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 from app.agents.state import AgentState
 from app.agents.base import BaseAgent
 from app.agents.router import RouterAgent
+from app.agents.speculative import SpeculativeRouter
+from app.agents.tools_node import DeadlineToolNode
 from app.agents.researcher import get_researcher_agent
 from app.agents.coder import get_coder_agent
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage
 from app.core.config import settings
 
-# 初始化模型 - 使用配置
-llm_kwargs = {
-    "model": settings.OPENAI_MODEL,
-    "temperature": 0,
-    "api_key": settings.OPENAI_API_KEY,
-}
-if settings.OPENAI_BASE_URL:
-    llm_kwargs["base_url"] = settings.OPENAI_BASE_URL
-
-llm = ChatOpenAI(**llm_kwargs)
-
-# 初始化Agents
-router_agent = RouterAgent(model=llm)
-researcher_agent = get_researcher_agent(model=llm)
-coder_agent = get_coder_agent(model=llm)
-general_agent = BaseAgent(
-    name="general_assistant",
-    model=llm,
-    system_prompt=(
-        "你是一个友好、博学的AI助手。你擅长:\n"
-        "- 日常对话和闲聊\n"
-        "- 创意写作（诗歌、故事、文案）\n"
-        "- 知识解答（科学、历史、文化）\n"
-        "- 提供建议和意见\n\n"
-        "请用友好、专业的语气回答用户问题。"
-    )
-)
-
-# 创建工具节点
-researcher_tools = ToolNode(researcher_agent.tools)
-coder_tools = ToolNode(coder_agent.tools)
-
-# 定义Graph
-workflow = StateGraph(AgentState)
+def create_llm(model: str) -> ChatOpenAI:
+    """创建指定模型的LLM客户端 - 使用配置"""
+    llm_kwargs = {
+        "model": model,
+        "temperature": 0,
+        "api_key": settings.OPENAI_API_KEY,
+        # 单次请求的上限；实际等待时间还受请求截止时间约束（见 app.agents.deadline）
+        "timeout": settings.OPENAI_TIMEOUT,
+        "max_retries": settings.OPENAI_MAX_RETRIES,
+    }
+    if settings.OPENAI_BASE_URL:
+        llm_kwargs["base_url"] = settings.OPENAI_BASE_URL
+    return ChatOpenAI(**llm_kwargs)
 
-# 添加节点
-workflow.add_node("router", router_agent)
-workflow.add_node("researcher", researcher_agent)
-workflow.add_node("researcher_tools", researcher_tools)
-workflow.add_node("coder", coder_agent)
-workflow.add_node("coder_tools", coder_tools)
-workflow.add_node("general_assistant", general_agent)
 
 # 路由逻辑：从router到specialized agents
 def route_after_router(state: AgentState):
     """Router决策后的路由"""
+    # 投机执行命中：Router节点已经产出了回答
+    if isinstance(state["messages"][-1], AIMessage):
+        return "end"
     return state["next"]
 
-workflow.set_entry_point("router")
-workflow.add_conditional_edges(
-    "router",
-    route_after_router,
-    {
-        "researcher": "researcher",
-        "coder": "coder",
-        "general_assistant": "general_assistant"
-    }
-)
 
 # Researcher工作流：检查是否需要调用工具
 def should_continue_researcher(state: AgentState):
@@ -91,17 +60,6 @@ def should_continue_researcher(state: AgentState):
         return "tools"
     return "end"
 
-workflow.add_conditional_edges(
-    "researcher",
-    should_continue_researcher,
-    {
-        "tools": "researcher_tools",
-        "end": END
-    }
-)
-
-# 工具执行后返回给researcher
-workflow.add_edge("researcher_tools", "researcher")
 
 # Coder工作流：检查是否需要调用工具
 def should_continue_coder(state: AgentState):
@@ -113,22 +71,92 @@ def should_continue_coder(state: AgentState):
         return "tools"
     return "end"
 
-workflow.add_conditional_edges(
-    "coder",
-    should_continue_coder,
-    {
-        "tools": "coder_tools",
-        "end": END
-    }
-)
 
-workflow.add_edge("coder_tools", "coder")
+def build_graph(llm: ChatOpenAI):
+    """围绕给定的LLM客户端构建并编译多Agent工作流"""
+    # 初始化Agents
+    router_agent = RouterAgent(
+        model=llm,
+        cascade=[create_llm(model) for model in settings.ROUTER_CASCADE_MODELS if model != llm.model_name]
+    )
+    researcher_agent = get_researcher_agent(model=llm)
+    coder_agent = get_coder_agent(model=llm)
+    general_agent = BaseAgent(
+        name="general_assistant",
+        model=llm,
+        system_prompt=(
+            "你是一个友好、博学的AI助手。你擅长:\n"
+            "- 日常对话和闲聊\n"
+            "- 创意写作（诗歌、故事、文案）\n"
+            "- 知识解答（科学、历史、文化）\n"
+            "- 提供建议和意见\n\n"
+            "请用友好、专业的语气回答用户问题。"
+        )
+    )
+
+    # 创建工具节点（每次工具调用受请求截止时间约束）
+    researcher_tools = DeadlineToolNode(researcher_agent.tools)
+    coder_tools = DeadlineToolNode(coder_agent.tools)
+
+    # 定义Graph
+    workflow = StateGraph(AgentState)
+
+    # 添加节点
+    if settings.ROUTER_SPECULATIVE_ENABLED:
+        workflow.add_node("router", SpeculativeRouter(router_agent, general_agent).as_node())
+    else:
+        workflow.add_node("router", router_agent.as_node())
+    workflow.add_node("researcher", researcher_agent.as_node())
+    workflow.add_node("researcher_tools", researcher_tools.as_node())
+    workflow.add_node("coder", coder_agent.as_node())
+    workflow.add_node("coder_tools", coder_tools.as_node())
+    workflow.add_node("general_assistant", general_agent.as_node())
+
+    workflow.set_entry_point("router")
+    workflow.add_conditional_edges(
+        "router",
+        route_after_router,
+        {
+            "researcher": "researcher",
+            "coder": "coder",
+            "general_assistant": "general_assistant",
+            "end": END
+        }
+    )
+
+    workflow.add_conditional_edges(
+        "researcher",
+        should_continue_researcher,
+        {
+            "tools": "researcher_tools",
+            "end": END
+        }
+    )
+
+    # 工具执行后返回给researcher
+    workflow.add_edge("researcher_tools", "researcher")
+
+    workflow.add_conditional_edges(
+        "coder",
+        should_continue_coder,
+        {
+            "tools": "coder_tools",
+            "end": END
+        }
+    )
+
+    workflow.add_edge("coder_tools", "coder")
+
+    # General assistant直接结束
+    workflow.add_edge("general_assistant", END)
+
+    # 编译Graph
+    return workflow.compile()
 
-# General assistant直接结束
-workflow.add_edge("general_assistant", END)
 
-# 编译Graph
-graph = workflow.compile()
+# 默认模型的客户端和Graph（其他模型见 app.agents.registry）
+llm = create_llm(settings.OPENAI_MODEL)
+graph = build_graph(llm)
 
 # 测试用例
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+"""
+Graph Registry - 按模型缓存LLM客户端和编译好的Graph
+
+- 首次请求某个模型时构建，之后复用（不在每个请求中重建Graph）
+- 只接受 get_available_models() 中列出的模型
+- 每个模型有独立的并发上限（asyncio.Semaphore）
+- 超过容量时按LRU淘汰空闲的条目
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional
+
+from langchain_openai import ChatOpenAI
+
+from app.agents import graph as default_graph
+from app.core.config import get_available_models, settings
+from app.core.exceptions import BadRequestError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelEntry:
+    """一个模型的LLM客户端、Graph和并发控制"""
+    model: str
+    llm: ChatOpenAI
+    graph: Any
+    semaphore: asyncio.Semaphore
+    in_flight: int = 0  # 正在处理或等待并发名额的请求数
+    requests: int = 0
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+class GraphRegistry:
+    """按模型缓存的Graph注册表"""
+
+    def __init__(self, max_entries: int = 4, max_concurrency: int = 16):
+        self.max_entries = max_entries
+        self.max_concurrency = max_concurrency
+
+        self._entries: "OrderedDict[str, ModelEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.builds = 0
+        self.evictions = 0
+
+    def resolve_model(self, model: Optional[str]) -> str:
+        """校验模型名称（为空时使用默认模型）"""
+        model = model or settings.OPENAI_MODEL
+        if model == settings.OPENAI_MODEL:
+            return model
+
+        available = {m["value"] for m in get_available_models()}
+        if model not in available:
+            raise BadRequestError(f"不支持的模型: {model}，可用模型: {', '.join(sorted(available))}")
+        return model
+
+    def get(self, model: Optional[str] = None) -> ModelEntry:
+        """获取模型对应的条目（不存在时构建）"""
+        model = self.resolve_model(model)
+
+        with self._lock:
+            entry = self._entries.get(model)
+            if entry is None:
+                entry = self._build(model)
+                self._entries[model] = entry
+                self._evict(keep=model)
+            self._entries.move_to_end(model)
+            entry.last_used = time.time()
+            return entry
+
+    @asynccontextmanager
+    async def acquire(self, model: Optional[str] = None) -> AsyncIterator[ModelEntry]:
+        """获取模型条目并占用一个并发名额"""
+        entry = self.get(model)
+        # 等待名额的请求也计入，避免条目在排队期间被淘汰
+        entry.in_flight += 1
+        try:
+            async with entry.semaphore:
+                entry.requests += 1
+                yield entry
+        finally:
+            entry.in_flight -= 1
+            entry.last_used = time.time()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表统计信息"""
+        with self._lock:
+            models = {
+                name: {
+                    "in_flight": entry.in_flight,
+                    "requests": entry.requests,
+                    "last_used": entry.last_used,
+                }
+                for name, entry in self._entries.items()
+            }
+        return {
+            "max_entries": self.max_entries,
+            "max_concurrency": self.max_concurrency,
+            "builds": self.builds,
+            "evictions": self.evictions,
+            "models": models,
+        }
+
+    def _build(self, model: str) -> ModelEntry:
+        if model == settings.OPENAI_MODEL:
+            # 默认模型复用模块级的Graph
+            llm, graph = default_graph.llm, default_graph.graph
+        else:
+            llm = default_graph.create_llm(model)
+            graph = default_graph.build_graph(llm)
+            self.builds += 1
+            logger.info(f"🧩 Built graph for model: {model}")
+
+        return ModelEntry(
+            model=model,
+            llm=llm,
+            graph=graph,
+            semaphore=asyncio.Semaphore(self.max_concurrency)
+        )
+
+    def _evict(self, keep: str) -> None:
+        """按LRU淘汰空闲条目（调用方需持有锁；正在处理请求的条目和刚构建的条目保留）"""
+        for name in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if name != keep and self._entries[name].in_flight == 0:
+                del self._entries[name]
+                self.evictions += 1
+                logger.info(f"🧹 Evicted graph for model: {name}")
+
+
+# 单例实例（全局使用）
+graph_registry = GraphRegistry(
+    max_entries=settings.MODEL_REGISTRY_MAX_ENTRIES,
+    max_concurrency=settings.MODEL_MAX_CONCURRENCY
+)
@@ -0,0 +1,123 @@
+"""
+路由决策缓存 - 相同请求不再重复路由
+
+缓存键 = hash(规范化的用户消息, 最近几条上下文消息)：
+- 规范化：去掉首尾空白、合并连续空白、转小写，措辞完全相同的重复提问可以命中
+- 上下文：只取最近 ROUTER_DECISION_CONTEXT_MESSAGES 条消息的内容，
+  同一句"继续"在不同上下文中可能去往不同的Agent
+
+只缓存路由结果（Agent名称），与模型无关，所有模型的Router共享。
+重新生成回答时直接复用该用户消息已有的决策（见 RouterAgent），不经过本缓存。
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+
+from app.core.config import settings
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """规范化用户消息（用于缓存键）"""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def route_cache_key(messages: Sequence[BaseMessage], context_messages: int = 2) -> str:
+    """计算路由决策缓存键：最新一条消息 + 之前的 context_messages 条消息"""
+    latest = normalize_text(str(messages[-1].content))
+    context = messages[-1 - context_messages:-1] if context_messages > 0 else []
+    raw = json.dumps(
+        {"message": latest, "context": [[m.type, str(m.content)] for m in context]},
+        ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RouteDecisionCache:
+    """路由决策缓存（内存 LRU + TTL）"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_size: int = 5000,
+        ttl_seconds: float = 3600,
+        context_messages: int = 2
+    ):
+        self.enabled = enabled
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.context_messages = context_messages
+
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (路由, 过期时间)
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, messages: Sequence[BaseMessage]) -> Optional[str]:
+        """计算缓存键（未启用或没有消息时返回None）"""
+        if not self.enabled or not messages:
+            return None
+        return route_cache_key(messages, self.context_messages)
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        """读取缓存的路由（未命中或已过期返回None）"""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Optional[str], route: str) -> None:
+        """写入路由决策"""
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (route, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> int:
+        """清空缓存，返回清除的条目数"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# 单例实例（路由决策与模型无关，所有模型的Router共享）
+route_decision_cache = RouteDecisionCache(
+    enabled=settings.ROUTER_DECISION_CACHE_ENABLED,
+    max_size=settings.ROUTER_DECISION_CACHE_MAX_SIZE,
+    ttl_seconds=settings.ROUTER_DECISION_CACHE_TTL_SECONDS,
+    context_messages=settings.ROUTER_DECISION_CONTEXT_MESSAGES
+)
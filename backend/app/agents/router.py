@@ -1,9 +1,20 @@
 """
 路由Agent - 智能分发用户请求到专业Agent
 """
-from typing import Literal
+import random
+from functools import cached_property
+from typing import Dict, List, Literal, Optional, Tuple, get_args
+import tiktoken
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_openai import ChatOpenAI
+from app.agents.cache import cache_key_for, llm_cache
+from app.agents.deadline import DeadlineExceeded, check_deadline, run_with_deadline
+from app.agents.embedding_router import embedding_router
+from app.agents.route_cache import route_decision_cache
+from app.agents.router_rules import rule_router
+from app.core.config import RouterMode, settings
 from app.agents.state import AgentState
 from pydantic import BaseModel, Field  # 使用pyd antic v2
 
@@ -18,10 +29,59 @@ class RouteResponse(BaseModel):
         description="路由决策的理由"
     )
 
+class CascadeRouteResponse(RouteResponse):
+    """级联路由中小模型的输出（附带置信度，低于阈值时升级到下一级）"""
+    confidence: float = Field(
+        ...,
+        ge=0,
+        le=1,
+        description="对该路由决策的置信度（0-1）"
+    )
+
+# 所有可选的路由
+ROUTES = get_args(RouteResponse.model_fields["next"].annotation)
+
+# 路由超时时的默认去向（不调用工具，直接生成降级回答）
+DEADLINE_FALLBACK_ROUTE = "general_assistant"
+
+# 标签模式：每个路由对应一个单token字母
+ROUTE_LABELS = {"A": "researcher", "B": "coder", "C": "general_assistant"}
+
+# 路由模型调用的回调标签（astream_events中的tags），流式接口据此不把路由输出当作回答token
+ROUTER_TAG = "router_llm"
+
+
+def label_logit_bias(model_name: str) -> Dict[int, int]:
+    """
+    把输出限制为路由标签的logit_bias（标签token的偏置设为最大值100）
+
+    tiktoken首次使用需要下载词表，加载失败（例如没有外网）时不设置偏置
+    """
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"⚠️  Failed to load tiktoken encoding for {model_name}, router labels unbiased: {e}")
+        return {}
+    bias = {}
+    for label in ROUTE_LABELS:
+        tokens = encoding.encode(label)
+        if len(tokens) == 1:
+            bias[tokens[0]] = 100
+    return bias
+
+
 class RouterAgent:
-    def __init__(self, model: ChatOpenAI):
+    def __init__(self, model: ChatOpenAI, cascade: Optional[List[ChatOpenAI]] = None):
+        """
+        Args:
+            model: 路由使用的模型（级联的最后一级）
+            cascade: 依次尝试的小模型，置信度达到 ROUTER_CASCADE_THRESHOLD 即采用
+        """
         self.model = model
-        self.system_prompt = (
+        guide = (
             "你是一个智能路由器，负责将用户请求分发给最合适的专业Agent。\n\n"
             "可用的Agent:\n"
             "1. researcher (研究员)\n"
@@ -37,37 +97,266 @@ class RouterAgent:
             "- 如果包含'搜索'、'查询'、'最新'、'今天'等关键词 → researcher\n"
             "- 如果包含'代码'、'编程'、'debug'、'实现'、'算法' → coder\n"
             "- 其他情况 → general_assistant\n\n"
-            "请分析用户意图，选择最合适的Agent，并简要说明理由。"
         )
+        self.system_prompt = guide + "请分析用户意图，选择最合适的Agent，并简要说明理由。"
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", self.system_prompt),
             MessagesPlaceholder(variable_name="messages"),
         ])
         
         # 绑定结构化输出
-        self.runnable = self.prompt | self.model.with_structured_output(RouteResponse)
+        self.runnable = (
+            self.prompt | self.model.with_structured_output(RouteResponse)
+        ).with_config(tags=[ROUTER_TAG])
+
+        # 标签模式：只输出一个字母，不生成理由（路由耗时主要取决于输出token数）
+        self.mode = settings.ROUTER_MODE
+        labels = ", ".join(f"{label} = {route}" for label, route in ROUTE_LABELS.items())
+        self.label_prompt = ChatPromptTemplate.from_messages([
+            ("system", guide + f"只输出一个字母表示选择的Agent（{labels}），不要输出任何其他内容。"),
+            MessagesPlaceholder(variable_name="messages"),
+        ])
+
+        # 级联：小模型先分类并给出置信度，不够确定时才交给下一级
+        cascade_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.system_prompt + "同时给出0到1之间的置信度（confidence）。"),
+            MessagesPlaceholder(variable_name="messages"),
+        ])
+        self.cascade = [
+            (
+                tier.model_name,
+                (cascade_prompt | tier.with_structured_output(CascadeRouteResponse)).with_config(tags=[ROUTER_TAG])
+            )
+            for tier in cascade or []
+        ]
+        self.cache = llm_cache if llm_cache.enabled_for("router") else None
+
+    @cached_property
+    def label_runnable(self):
+        """标签模式的路由链（首次使用时构造，structured模式下不会加载tiktoken词表）"""
+        label_kwargs = {"max_tokens": settings.ROUTER_LABEL_MAX_TOKENS}
+        if settings.ROUTER_LABEL_LOGIT_BIAS:
+            bias = label_logit_bias(self.model.model_name)
+            if bias:
+                label_kwargs["logit_bias"] = bias
+        return (
+            self.label_prompt
+            | self.model.bind(**label_kwargs)
+            | StrOutputParser()
+            | RunnableLambda(self._parse_label)
+        ).with_config(tags=[ROUTER_TAG])
+
+    def __call__(self, state: AgentState, config: Optional[RunnableConfig] = None):
+        decision = self.fast_path(state)
+        if decision is not None:
+            return decision
+        return self.classify(state, config)
 
-    def __call__(self, state: AgentState):
+    async def ainvoke(self, state: AgentState, config: Optional[RunnableConfig] = None):
+        # 重新生成 / 规则 / 决策缓存：命中时省去一次LLM调用
+        decision = self.fast_path(state)
+        if decision is not None:
+            return decision
+        return await self.aclassify(state, config)
+
+    def classify(self, state: AgentState, config: Optional[RunnableConfig] = None) -> dict:
+        """需要调用模型的路由：向量路由 → LLM缓存 → LLM分类"""
+        messages = state["messages"]
+        decision_key = route_decision_cache.key_for(messages)
+        response = self._match_embedding_sync(messages)
+        if response is not None:
+            return self._decide(state, response, "embedding", decision_key)
+
+        key = self._cache_key(messages)
+        response = self._cache_get(key)
+        decided_by = "cache"
+        if response is None:
+            try:
+                check_deadline(state)
+            except DeadlineExceeded:
+                return {"next": DEADLINE_FALLBACK_ROUTE}
+            response, decided_by = self._route_llm(messages, config)
+            self._cache_set(key, response)
+        return self._decide(state, response, decided_by, decision_key)
+
+    async def aclassify(self, state: AgentState, config: Optional[RunnableConfig] = None) -> dict:
+        """需要调用模型的路由（异步版本）"""
+        messages = state["messages"]
+        decision_key = route_decision_cache.key_for(messages)
+        # 向量路由：一次embedding + 本地打分，置信度不足时继续走LLM
+        response = await self._match_embedding(messages)
+        if response is not None:
+            return self._decide(state, response, "embedding", decision_key)
+
+        key = self._cache_key(messages)
+        response = self._cache_get(key)
+        decided_by = "cache"
+        if response is None:
+            try:
+                response, decided_by = await run_with_deadline(
+                    self._aroute_llm(messages, config), state
+                )
+            except DeadlineExceeded:
+                # 超时后交给通用助手生成降级回答
+                return {"next": DEADLINE_FALLBACK_ROUTE}
+            self._cache_set(key, response)
+        return self._decide(state, response, decided_by, decision_key)
+
+    def as_node(self) -> RunnableLambda:
+        """包装为同时支持同步和异步调用的Graph节点"""
+        return RunnableLambda(self, afunc=self.ainvoke)
+
+    def fast_path(self, state: AgentState) -> Optional[dict]:
+        """不需要调用任何模型的路由：重新生成复用、规则、决策缓存"""
+        messages = state["messages"]
+
+        # 重新生成：复用该用户消息上一次的路由决策
+        route = state.get("route_hint")
+        if route in ROUTES:
+            response = RouteResponse(next=route, reasoning="重新生成，复用已有的路由决策")
+            self._log_decision(state, response, decided_by="reuse")
+            return {"next": response.next}
+
+        response = self._match_rules(messages)
+        if response is not None:
+            self._log_decision(state, response, decided_by="rule")
+            return {"next": response.next}
+
+        route = route_decision_cache.get(route_decision_cache.key_for(messages))
+        if route is not None:
+            response = RouteResponse(next=route, reasoning="路由决策缓存命中")
+            self._log_decision(state, response, decided_by="decision_cache")
+            return {"next": response.next}
+        return None
+
+    def _decide(self, state: AgentState, response: RouteResponse, decided_by: str, decision_key: Optional[str]) -> dict:
+        """记录由模型得到的路由决策，并写入决策缓存"""
+        route_decision_cache.set(decision_key, response.next)
+        self._log_decision(state, response, decided_by=decided_by)
+        return {"next": response.next}
+
+    @staticmethod
+    def _match_rules(messages) -> Optional[RouteResponse]:
+        """对最新的用户消息应用规则路由（无法确定时返回None）"""
+        if not settings.ROUTER_RULES_ENABLED or not messages:
+            return None
+        match = rule_router.match(str(messages[-1].content))
+        if match is None:
+            return None
+        return RouteResponse(next=match.route, reasoning=match.reasoning)
+
+    @staticmethod
+    def _match_embedding_sync(messages) -> Optional[RouteResponse]:
+        """向量路由（同步版本）"""
+        if not embedding_router.enabled or not messages:
+            return None
+        try:
+            match = embedding_router.classify(str(messages[-1].content))
+        except Exception as e:
+            print(f"⚠️  Embedding router failed: {e}")
+            return None
+        if match is None:
+            return None
+        return RouteResponse(next=match.route, reasoning=match.reasoning)
+
+    @staticmethod
+    async def _match_embedding(messages) -> Optional[RouteResponse]:
+        """向量路由（未启用、索引未就绪或置信度不足时返回None）"""
+        if not embedding_router.enabled or not messages:
+            return None
+        try:
+            match = await embedding_router.aclassify(str(messages[-1].content))
+        except Exception as e:
+            print(f"⚠️  Embedding router failed: {e}")
+            return None
+        if match is None:
+            return None
+        return RouteResponse(next=match.route, reasoning=match.reasoning)
+
+    def _route_llm(self, messages, config: Optional[RunnableConfig]) -> Tuple[RouteResponse, str]:
+        """依次尝试级联的各级模型，返回(路由结果, 决策来源)"""
+        for name, runnable in self.cascade:
+            try:
+                response = runnable.invoke({"messages": messages}, config)
+            except Exception as e:
+                print(f"⚠️  Cascade router {name} failed: {e}")
+                continue
+            if self._confident(name, response):
+                return response, f"llm:{name}"
+        return self._select_runnable().invoke({"messages": messages}, config), "llm"
+
+    async def _aroute_llm(self, messages, config: Optional[RunnableConfig]) -> Tuple[RouteResponse, str]:
+        """依次尝试级联的各级模型（异步版本）"""
+        for name, runnable in self.cascade:
+            try:
+                response = await runnable.ainvoke({"messages": messages}, config)
+            except Exception as e:
+                print(f"⚠️  Cascade router {name} failed: {e}")
+                continue
+            if self._confident(name, response):
+                return response, f"llm:{name}"
+        return await self._select_runnable().ainvoke({"messages": messages}, config), "llm"
+
+    @staticmethod
+    def _confident(name: str, response: CascadeRouteResponse) -> bool:
+        if response.confidence >= settings.ROUTER_CASCADE_THRESHOLD:
+            return True
+        print(f"⬆️  Cascade router {name}: {response.next} ({response.confidence:.2f}) below threshold, escalating")
+        return False
+
+    def _select_runnable(self):
+        """标签模式下按ROUTER_REASONING_SAMPLE_RATE采样一部分请求生成完整理由（用于监控）"""
+        if self.mode == RouterMode.LABEL and random.random() >= settings.ROUTER_REASONING_SAMPLE_RATE:
+            return self.label_runnable
+        return self.runnable
+
+    @staticmethod
+    def _parse_label(text: str) -> RouteResponse:
+        """把标签模式的输出转换为路由结果（无法识别时交给通用助手）"""
+        label = text.strip()[:1].upper()
+        route = ROUTE_LABELS.get(label)
+        if route is None:
+            print(f"⚠️  Unrecognized router label: {text!r}")
+            return RouteResponse(next="general_assistant", reasoning=f"无法识别的标签: {text!r}")
+        return RouteResponse(next=route, reasoning=f"标签模式: {label}")
+
+    def _cache_key(self, messages) -> Optional[str]:
+        if self.cache is None:
+            return None
+        # 结构化输出的schema和路由模式也会影响结果
+        return cache_key_for(
+            self.model, self.system_prompt, messages,
+            extra={"schema": RouteResponse.model_json_schema(), "mode": self.mode}
+        )
+
+    def _cache_get(self, key: Optional[str]) -> Optional[RouteResponse]:
+        if key is None:
+            return None
+        data = self.cache.get(key, agent_name="router")
+        return RouteResponse(**data) if data is not None else None
+
+    def _cache_set(self, key: Optional[str], response: RouteResponse) -> None:
+        if key is not None:
+            self.cache.set(key, response.model_dump())
+
+    def _log_decision(self, state: AgentState, response: RouteResponse, decided_by: str = "llm"):
         messages = state["messages"]
-        response = self.runnable.invoke({"messages": messages})
         
         # 记录路由决策（用于调试）
-        print(f"🔀 Router Decision: {response.next} | Reason: {response.reasoning}")
+        print(f"🔀 Router Decision: {response.next} ({decided_by}) | Reason: {response.reasoning}")
         
-        # 保存到数据库（用于监控）
+        # 保存到数据库（用于监控）- 放入批量写入队列，不阻塞路由
         try:
-            from app.api.v1.endpoints.router_monitor import log_route_decision
+            from app.services.route_logger import route_decision_logger
             user_message = messages[-1].content if messages else ""
             # 从state中获取session_id（如果有）
             session_id = state.get("session_id", "unknown")
-            log_route_decision(
+            route_decision_logger.log(
                 session_id=session_id,
                 user_message=user_message,
                 routed_to=response.next,
-                reasoning=response.reasoning
+                reasoning=response.reasoning,
+                decided_by=decided_by
             )
         except Exception as e:
             print(f"⚠️  Failed to log route decision: {e}")
-        
-        return {"next": response.next}
-
@@ -0,0 +1,109 @@
+"""
+规则路由 - 在LLM路由之前的确定性快速路径
+
+对最新一条用户消息应用关键词和正则规则：
+- 恰好一个路由命中：直接使用，跳过LLM分类调用
+- 没有命中，或多个路由同时命中（冲突）：交给LLM路由
+
+默认规则与 RouterAgent 提示词中的决策规则一致，可通过 ROUTER_RULES 覆盖。
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern
+
+from app.core.config import settings
+
+# 默认规则：{路由: {"keywords": [...], "patterns": [...]}}（关键词不区分大小写）
+DEFAULT_RULES: Dict[str, Dict[str, List[str]]] = {
+    "researcher": {
+        "keywords": ["搜索", "查询", "最新", "今天", "新闻", "天气", "实时", "股价"],
+        "patterns": [],
+    },
+    "coder": {
+        "keywords": ["代码", "编程", "debug", "实现", "算法", "报错", "函数", "python"],
+        "patterns": [r"```", r"Traceback \(most recent call last\)", r"\bdef \w+\(", r"\bimport \w+"],
+    },
+    "general_assistant": {
+        "keywords": [],
+        "patterns": [r"^\s*(你好|您好|hi|hello|hey|嗨|谢谢|多谢|thanks|thank you)[\s!！。.,，~]*$"],
+    },
+}
+
+
+@dataclass
+class RouteRule:
+    """一个路由的匹配规则"""
+    route: str
+    keywords: List[str] = field(default_factory=list)
+    patterns: List[Pattern[str]] = field(default_factory=list)
+
+    def first_match(self, text: str) -> Optional[str]:
+        """返回第一个命中的关键词或正则，未命中返回None"""
+        lowered = text.lower()
+        for keyword in self.keywords:
+            if keyword in lowered:
+                return keyword
+        for pattern in self.patterns:
+            if pattern.search(text):
+                return pattern.pattern
+        return None
+
+
+@dataclass
+class RuleMatch:
+    """规则路由的结果"""
+    route: str
+    reasoning: str
+
+
+class RuleRouter:
+    """关键词/正则规则路由"""
+
+    def __init__(self, rules: Dict[str, Dict[str, List[str]]]):
+        self.rules = [
+            RouteRule(
+                route=route,
+                keywords=[k.lower() for k in spec.get("keywords", [])],
+                patterns=[re.compile(p, re.IGNORECASE) for p in spec.get("patterns", [])]
+            )
+            for route, spec in rules.items()
+        ]
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+
+    def match(self, text: str) -> Optional[RuleMatch]:
+        """对用户消息应用规则，无法确定时返回None（交给LLM路由）"""
+        matched = {}
+        for rule in self.rules:
+            hit = rule.first_match(text)
+            if hit is not None:
+                matched[rule.route] = hit
+
+        if len(matched) == 1:
+            self.hits += 1
+            route, hit = next(iter(matched.items()))
+            return RuleMatch(route=route, reasoning=f"规则命中: {hit}")
+
+        if matched:
+            self.conflicts += 1
+        else:
+            self.misses += 1
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取规则命中统计"""
+        total = self.hits + self.misses + self.conflicts
+        return {
+            "enabled": settings.ROUTER_RULES_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "conflicts": self.conflicts,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# 单例实例（规则与模型无关，所有模型的Router共享）
+rule_router = RuleRouter(settings.ROUTER_RULES or DEFAULT_RULES)
@@ -0,0 +1,124 @@
+"""
+投机执行 - Router与通用助手并行运行
+
+大部分请求最终由 general_assistant 处理，顺序执行时用户要先等Router的分类调用。
+开启 ROUTER_SPECULATIVE_ENABLED 后，Router节点在需要调用模型分类时：
+- 同时启动 general_assistant 的回答
+- Router选择 general_assistant：保留投机结果，Graph直接结束（Router延迟被隐藏）
+- Router选择其他Agent：取消投机调用，记录浪费的token
+
+快速路径（重新生成复用、规则、决策缓存）不需要等待模型，不做投机。
+投机调用带有 SPECULATIVE_TAG 标签，流式接口据此在路由确定前缓存其token。
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from app.agents.base import BaseAgent
+from app.agents.budget import estimate_tokens
+from app.agents.router import RouterAgent
+from app.agents.state import AgentState
+
+# 投机调用的回调标签（astream_events中的tags）
+SPECULATIVE_TAG = "speculative"
+
+
+class SpeculationStats:
+    """投机执行统计（命中率与浪费的token）"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0  # 快速路径已决定路由，没有投机
+        self.failed = 0  # 路由一致但投机调用失败（计入misses）
+        self.wasted_tokens = 0  # 未命中时取消的调用消耗的token（估算）
+        self.hidden_router_ms = 0.0  # 命中时被隐藏的Router耗时
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "wasted_tokens": self.wasted_tokens,
+            "avg_wasted_tokens": round(self.wasted_tokens / self.misses, 1) if self.misses else 0.0,
+            "avg_hidden_router_ms": round(self.hidden_router_ms / self.hits, 2) if self.hits else 0.0,
+        }
+
+
+class SpeculativeRouter:
+    """Router节点：分类的同时投机运行一个Agent"""
+
+    def __init__(self, router: RouterAgent, agent: BaseAgent, stats: Optional[SpeculationStats] = None):
+        self.router = router
+        self.agent = agent
+        self.stats = stats or speculation_stats
+        # 作为子Runnable运行，流式接口可以在投机结果之前看到路由决策
+        self._classify = RunnableLambda(router.classify, afunc=router.aclassify)
+
+    def __call__(self, state: AgentState, config: Optional[RunnableConfig] = None):
+        # 同步调用没有并行，直接使用Router
+        return self.router(state, config)
+
+    async def ainvoke(self, state: AgentState, config: Optional[RunnableConfig] = None):
+        decision = self.router.fast_path(state)
+        if decision is not None:
+            self.stats.skipped += 1
+            return decision
+
+        started = time.perf_counter()
+        task = asyncio.create_task(self.agent.ainvoke(state, _speculative_config(config)))
+        try:
+            decision = await self._classify.ainvoke(state, config)
+        except BaseException:
+            task.cancel()
+            raise
+        router_ms = (time.perf_counter() - started) * 1000
+
+        if decision["next"] == self.agent.name:
+            try:
+                result = await task
+            except (Exception, asyncio.CancelledError) as e:
+                if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                    # 取消的是Router节点本身（例如客户端断开）
+                    raise
+                # 投机调用失败或被取消（例如429/5xx）不影响路由结果，交给Graph正常运行该Agent
+                self.stats.misses += 1
+                self.stats.failed += 1
+                print(f"⚠️  Speculative {self.agent.name} failed, running it normally: {e!r}")
+                return decision
+            self.stats.hits += 1
+            self.stats.hidden_router_ms += router_ms
+            print(f"⚡ Speculation hit: {self.agent.name} (router {router_ms:.0f}ms hidden)")
+            return {**decision, "messages": result["messages"]}
+
+        task.cancel()
+        await asyncio.wait([task])
+        response = None
+        if not task.cancelled() and task.exception() is None:
+            response = task.result()["messages"][-1]
+        wasted = estimate_tokens(self.agent.llm.model_name, self.agent.system_prompt, state["messages"], response)
+        self.stats.misses += 1
+        self.stats.wasted_tokens += wasted
+        print(f"🗑️  Speculation miss: routed to {decision['next']}, ~{wasted} tokens wasted")
+        return decision
+
+    def as_node(self) -> RunnableLambda:
+        """包装为同时支持同步和异步调用的Graph节点"""
+        return RunnableLambda(self, afunc=self.ainvoke)
+
+
+def _speculative_config(config: Optional[RunnableConfig]) -> RunnableConfig:
+    """给投机调用加上标签（回调事件中可识别）"""
+    config = dict(config or {})
+    config["tags"] = [*config.get("tags", []), SPECULATIVE_TAG]
+    return config
+
+
+# 单例实例（所有模型的Graph共享统计）
+speculation_stats = SpeculationStats()
@@ -1,4 +1,4 @@
-from typing import TypedDict, Annotated, Sequence, Optional
+from typing import Any, Dict, TypedDict, Annotated, Sequence, Optional
 import operator
 from langchain_core.messages import BaseMessage
 
@@ -6,3 +6,6 @@ class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
     next: str
     session_id: Optional[str]  # 用于路由日志
+    deadline: Optional[float]  # 请求截止时间（time.time()时间戳），None表示不限制
+    route_hint: Optional[str]  # 重新生成时该用户消息已有的路由决策（Router直接复用）
+    budget_usage: Optional[Dict[str, Dict[str, Any]]]  # 各Agent本轮的预算用量（见 app.agents.budget）
@@ -0,0 +1,102 @@
+"""
+工具执行节点 - 按请求截止时间限制每次工具调用
+
+替代 langgraph.prebuilt.ToolNode：执行上一条AIMessage中的工具调用，
+每次调用只能使用剩余时间，超时的调用返回超时提示而不是一直等待
+
+同一条AIMessage中的多个工具调用并发执行（异步用asyncio，同步用线程池），
+每个工具在一步内的并发数受 TOOL_MAX_CONCURRENCY / TOOL_CONCURRENCY_LIMITS 限制，
+返回的ToolMessage保持工具调用的原始顺序
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import BaseTool
+
+from app.agents.deadline import DeadlineExceeded, check_deadline, run_with_deadline
+from app.agents.state import AgentState
+from app.core.config import settings
+
+TIMEOUT_MESSAGE = "❌ 工具执行超时（请求已接近截止时间），请基于已有信息回答"
+
+
+class DeadlineToolNode:
+    """带截止时间的工具执行节点"""
+
+    def __init__(self, tools: List[BaseTool]):
+        self.tools = tools
+        self.tools_by_name: Dict[str, BaseTool] = {tool.name: tool for tool in tools}
+
+    def __call__(self, state: AgentState, config: Optional[RunnableConfig] = None):
+        calls = self._tool_calls(state)
+        limits = {name: threading.BoundedSemaphore(self._limit(name)) for name in {c["name"] for c in calls}}
+
+        def run(call: Dict[str, Any]) -> ToolMessage:
+            try:
+                with limits[call["name"]]:
+                    check_deadline(state)
+                    output = self._get_tool(call).invoke(call["args"], config)
+            except DeadlineExceeded:
+                output = TIMEOUT_MESSAGE
+            except Exception as e:
+                output = self._error_message(call, e)
+            return self._to_message(call, output)
+
+        if len(calls) <= 1:
+            return {"messages": [run(call) for call in calls]}
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            # map按提交顺序返回结果
+            return {"messages": list(executor.map(run, calls))}
+
+    async def ainvoke(self, state: AgentState, config: Optional[RunnableConfig] = None):
+        calls = self._tool_calls(state)
+        limits = {name: asyncio.Semaphore(self._limit(name)) for name in {c["name"] for c in calls}}
+
+        async def run(call: Dict[str, Any]) -> ToolMessage:
+            try:
+                async with limits[call["name"]]:
+                    output = await run_with_deadline(
+                        self._get_tool(call).ainvoke(call["args"], config), state
+                    )
+            except DeadlineExceeded:
+                output = TIMEOUT_MESSAGE
+            except Exception as e:
+                output = self._error_message(call, e)
+            return self._to_message(call, output)
+
+        # gather按调用顺序返回结果
+        return {"messages": list(await asyncio.gather(*(run(call) for call in calls)))}
+
+    def as_node(self) -> RunnableLambda:
+        """包装为同时支持同步和异步调用的Graph节点"""
+        return RunnableLambda(self, afunc=self.ainvoke)
+
+    @staticmethod
+    def _limit(name: str) -> int:
+        """工具在一步内的最大并发数"""
+        return max(settings.TOOL_CONCURRENCY_LIMITS.get(name, settings.TOOL_MAX_CONCURRENCY), 1)
+
+    @staticmethod
+    def _tool_calls(state: AgentState) -> List[Dict[str, Any]]:
+        last_message = state["messages"][-1]
+        if not isinstance(last_message, AIMessage):
+            raise ValueError("Last message is not an AIMessage")
+        return last_message.tool_calls
+
+    def _get_tool(self, call: Dict[str, Any]) -> BaseTool:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            raise ValueError(f"未知工具: {call['name']}")
+        return tool
+
+    @staticmethod
+    def _error_message(call: Dict[str, Any], error: Exception) -> str:
+        return f"❌ 工具 {call['name']} 执行失败: {type(error).__name__}: {error}"
+
+    @staticmethod
+    def _to_message(call: Dict[str, Any], output: Any) -> ToolMessage:
+        return ToolMessage(content=str(output), name=call["name"], tool_call_id=call["id"])
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import chat, router_monitor, sessions, projects, messages, config
+from app.api.v1.endpoints import chat, router_monitor, sessions, projects, messages, config, metrics
 
 api_router = APIRouter()
 api_router.include_router(chat.router, tags=["chat"])
@@ -8,3 +8,4 @@ api_router.include_router(sessions.router, tags=["sessions"])
 api_router.include_router(projects.router, tags=["projects"])
 api_router.include_router(messages.router, tags=["messages"])
 api_router.include_router(config.router, tags=["config"])
+api_router.include_router(metrics.router, tags=["monitoring"])
\ No newline at end of file
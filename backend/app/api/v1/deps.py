@@ -0,0 +1,26 @@
+"""
+API 依赖项
+
+提供请求级别的数据库工作单元：一个请求只检出一次连接、只提交一次
+"""
+from typing import Annotated, Generator
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+
+
+def get_db_session() -> Generator[Session, None, None]:
+    """
+    请求级数据库会话
+    
+    请求正常结束时统一提交，出现异常时回滚。
+    服务层方法通过 db 参数接收该会话，不再各自打开连接和提交。
+    """
+    with get_db() as db:
+        yield db
+
+
+# 在端点签名中使用: async def endpoint(db: DBSession): ...
+DBSession = Annotated[Session, Depends(get_db_session)]
@@ -1,134 +1,724 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Dict, Optional, AsyncIterator, List
+from dataclasses import dataclass, field
+from contextlib import aclosing
+from sqlalchemy.orm import Session
+import asyncio
+import json
+import math
+import time
 from app.services.session import SessionService
 from app.services.message import MessageService
+from app.services.context import count_tokens, get_token_budget
+from app.services.memory import MemoryService
+from app.services.background import background_queue
+from app.services.write_behind import message_write_buffer
+from app.services.semantic_cache import SemanticLookup, semantic_cache
+from app.services.idempotency import idempotency_store, request_fingerprint
 from app.db.database import get_db
-from app.agents.graph import graph  # Import compiled graph
+from app.api.v1.deps import DBSession
+from app.agents.registry import graph_registry  # 按模型缓存的Graph
+from app.agents.deadline import make_deadline
+from app.agents.router import ROUTER_TAG
+from app.agents.speculative import SPECULATIVE_TAG
+from app.core.config import settings
+from app.core.admission import AdmissionTicket, admission_controller
+from app.core.cancellation import ClientDisconnected, run_until_disconnected
+from app.core.exceptions import BadRequestError, BaseAPIException
 from app.core.logging import get_logger
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+# Router可能的决策结果
+ROUTES = ("researcher", "coder", "general_assistant")
+
+# 所有批量请求共享的并发名额：多个批量请求同时运行也不会占满模型的并发名额
+_batch_semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
 class ChatRequest(BaseModel):
     message: str
     session_id: str
     user_id: str = "default_user"
     model: Optional[str] = "gpt-4o"
 
+
+class BatchChatItem(BaseModel):
+    message: str
+    session_id: Optional[str] = None  # 指定时按普通对话读取历史并保存，否则不落库
+    id: Optional[str] = None  # 调用方自定义的标识，原样返回
+
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem] = Field(..., min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+    user_id: str = "default_user"
+    model: Optional[str] = "gpt-4o"
+    max_concurrency: Optional[int] = Field(None, ge=1)  # 不超过BATCH_MAX_CONCURRENCY
+
+
+@dataclass
+class TurnContext:
+    """调用Graph之前读取到的本轮对话上下文"""
+    session_exists: bool
+    message_count: int  # 保存用户消息之前的消息数量
+    user_message_id: Optional[int]  # 已存在的相同内容用户消息（重新生成时复用）
+    history: List[BaseMessage] = field(default_factory=list)  # 当前分支的对话历史
+    route_hint: Optional[str] = None  # 重新生成时复用的路由决策
+
+
+def _prepare_turn(db: Session, request: ChatRequest) -> TurnContext:
+    """
+    读取本轮对话需要的会话信息
+
+    只做读操作：所有写入推迟到Graph运行结束后在同一事务中完成，
+    避免在LLM调用期间持有SQLite写锁
+    """
+    # Check if session exists
+    existing = SessionService.get_session(request.session_id, db=db)
+    if not existing and not request.session_id.startswith('session_'):
+        # 前端生成的会话ID以session_开头，其他格式改用新生成的ID
+        request.session_id = SessionService.generate_session_id()
+
+    if not existing:
+        return TurnContext(session_exists=False, message_count=0, user_message_id=None)
+
+    # Get message count BEFORE saving user message
+    message_count = MessageService.get_message_count(request.session_id, db=db)
+
+    # 检查是否有相同内容的用户消息（用于版本分组）
+    existing_user_msg_id = MessageService.find_user_message_by_content(
+        request.session_id,
+        request.message,
+        db=db
+    )
+
+    # 会话摘要 + 当前分支的最近历史（按模型token预算截断，预算包含本轮用户消息）
+    model = request.model or settings.OPENAI_MODEL
+    history = MemoryService.build_context(
+        request.session_id,
+        model=model,
+        budget=get_token_budget(model) - count_tokens(request.message, model),
+        before_message_id=existing_user_msg_id,
+        db=db
+    ) if message_count else []
+
+    # 重新生成：复用该用户消息上一次的路由决策，跳过Router的模型调用
+    route_hint = MessageService.get_latest_agent_type(
+        existing_user_msg_id, db=db
+    ) if existing_user_msg_id else None
+
+    return TurnContext(
+        session_exists=True,
+        message_count=message_count,
+        user_message_id=existing_user_msg_id,
+        history=history,
+        route_hint=route_hint
+    )
+
+
+def _finalize_turn(
+    db: Session,
+    request: ChatRequest,
+    turn: TurnContext,
+    response_content: str,
+    agent_type: str
+) -> int:
+    """在同一个工作单元中写入会话、用户消息和助手消息，返回助手消息ID"""
+    if not turn.session_exists:
+        # 新会话的标题随会话一起写入，无需额外更新
+        SessionService.create_session(
+            user_id=request.user_id or "default_user",
+            title=SessionService.generate_title(request.message),
+            session_id=request.session_id,
+            db=db
+        )
+        logger.info(f"创建新会话: session_id={request.session_id}")
+
+    # 如果是相同内容，不创建新的用户消息，而是使用现有的
+    if turn.user_message_id:
+        logger.debug(f"找到相同内容的用户消息: message_id={turn.user_message_id}, 将创建新版本")
+        user_message_id = turn.user_message_id
+    else:
+        # 创建新的用户消息（parent_id为NULL，表示根节点）
+        user_message_id = MessageService.create_message(
+            session_id=request.session_id,
+            role="user",
+            content=request.message,
+            model=request.model,
+            parent_id=None,  # 用户消息是根节点
+            sibling_index=0,
+            db=db
+        )
+
+    # Save assistant message as child of user message
+    # sibling_index会自动计算（同一父节点下的第几个子节点）
+    assistant_message_id = MessageService.create_message(
+        session_id=request.session_id,
+        role="assistant",
+        content=response_content,
+        agent_type=agent_type,
+        model=request.model,
+        parent_id=user_message_id,  # 助手消息的父节点是用户消息
+        sibling_index=None,  # 自动计算
+        db=db
+    )
+
+    logger.info(f"助手消息创建成功: message_id={assistant_message_id}, agent_type={agent_type}")
+
+    return assistant_message_id
+
+
+async def _persist_turn(
+    request: ChatRequest,
+    turn: TurnContext,
+    response_content: str,
+    agent_type: str,
+    db: Optional[Session] = None
+) -> int:
+    """
+    持久化一轮对话，返回助手消息ID
+
+    启用组提交时，整轮写入作为一个条目进入写入缓冲区，与并发请求合并提交；
+    否则写入请求级会话（由依赖项提交），没有请求级会话时使用独立工作单元
+    """
+    if message_write_buffer.enabled:
+        return await message_write_buffer.submit(
+            lambda session: _finalize_turn(session, request, turn, response_content, agent_type)
+        )
+    if db is not None:
+        return await run_in_threadpool(_finalize_turn, db, request, turn, response_content, agent_type)
+    return await run_in_threadpool(_commit_turn, request, turn, response_content, agent_type)
+
+
+def _schedule_side_effects(request: ChatRequest, turn: TurnContext) -> None:
+    """
+    提交响应返回后执行的非关键写入（标题生成、会话时间戳、摘要更新）
+
+    新会话在创建时已写入标题和时间戳，无需更新
+    """
+    if not turn.session_exists:
+        return
+
+    # 长会话：把旧轮次折叠进滚动摘要
+    MemoryService.schedule_update(request.session_id, turn.message_count)
+
+    # Auto-generate title for first message (message_count was 0 before user message)
+    if turn.message_count == 0:
+        background_queue.submit(SessionService.auto_generate_title, request.session_id, request.message)
+        logger.debug(f"自动生成会话标题: session_id={request.session_id}")
+
+    # Update session timestamp
+    if message_write_buffer.enabled:
+        message_write_buffer.touch_session(request.session_id)
+    else:
+        background_queue.submit(SessionService.update_session_timestamp, request.session_id)
+
+
+def _commit_turn(
+    request: ChatRequest,
+    turn: TurnContext,
+    response_content: str,
+    agent_type: str
+) -> int:
+    """在独立的工作单元中完成写入（流式接口的请求级会话在响应开始前已关闭）"""
+    with get_db() as db:
+        return _finalize_turn(db, request, turn, response_content, agent_type)
+
+
+async def _semantic_lookup(request: ChatRequest, turn: TurnContext) -> Optional[SemanticLookup]:
+    """查询语义缓存（只用于没有历史的首轮问题；重新生成时需要新回答，跳过）"""
+    if turn.history or turn.user_message_id:
+        return None
+    return await semantic_cache.lookup(request.message, request.model or settings.OPENAI_MODEL)
+
+
+def _is_degraded(message: BaseMessage) -> bool:
+    """是否为超时后的降级回答（不写入缓存）"""
+    return bool(message.additional_kwargs.get("degraded"))
+
+
+def _semantic_store(request: ChatRequest, lookup: Optional[SemanticLookup], agent_type: str, response_content: str) -> None:
+    """把新回答写入语义缓存（后台执行，命中缓存的回答不重复写入）"""
+    semantic_cache.store(lookup, request.message, request.model or settings.OPENAI_MODEL, agent_type, response_content)
+
+
+def _load_turn(request: ChatRequest) -> TurnContext:
+    """在独立的只读工作单元中读取本轮上下文（批量接口没有请求级会话可共享）"""
+    with get_db() as db:
+        return _prepare_turn(db, request)
+
+
+def _request_timeout(http_request: Request) -> Optional[float]:
+    """
+    读取X-Request-Timeout请求头（秒），未设置时返回None（使用默认配置）
+
+    请求头只能缩短或延长截止时间（不超过REQUEST_TIMEOUT_MAX_SECONDS），
+    不能关闭截止时间：0、负数、nan、inf都返回400
+    """
+    header = http_request.headers.get("X-Request-Timeout")
+    if not header:
+        return None
+    try:
+        timeout = float(header)
+    except ValueError:
+        raise BadRequestError(f"X-Request-Timeout必须是秒数: {header}")
+    if not math.isfinite(timeout) or timeout <= 0:
+        raise BadRequestError(f"X-Request-Timeout必须是大于0的秒数: {header}")
+    return min(timeout, settings.REQUEST_TIMEOUT_MAX_SECONDS)
+
+
+def _initial_state(request: ChatRequest, turn: TurnContext, deadline: Optional[float] = None) -> dict:
+    """构造Graph的初始状态（对话历史 + 本轮用户消息 + 截止时间）"""
+    return {
+        "messages": [*turn.history, HumanMessage(content=request.message)],
+        "next": "",
+        "session_id": request.session_id,
+        "deadline": deadline,
+        "route_hint": turn.route_hint
+    }
+
+
+async def _run_turn(
+    request: ChatRequest,
+    turn: TurnContext,
+    deadline: Optional[float],
+    db: Optional[Session] = None,
+    http_request: Optional[Request] = None
+) -> dict:
+    """
+    运行一轮对话并持久化，返回响应体
+
+    Args:
+        db: 请求级会话（写入由依赖项统一提交）；为None时使用独立工作单元
+        http_request: 指定时在客户端断开后取消Graph（抛出ClientDisconnected）
+    """
+    lookup = await _semantic_lookup(request, turn)
+    if lookup is not None and lookup.hit:
+        # 语义缓存命中：跳过Router和Agent
+        response_content = lookup.answer
+        agent_type = lookup.route
+    else:
+        # Run the workflow（使用所选模型的Graph，受该模型并发上限约束）
+        async with graph_registry.acquire(request.model) as entry:
+            run = entry.graph.ainvoke(_initial_state(request, turn, deadline))
+            result = await (run_until_disconnected(http_request, run) if http_request is not None else run)
+        final_message = result['messages'][-1]
+        response_content = final_message.content
+
+        # Router的决策即为处理该请求的Agent
+        agent_type = result.get('next') or "general_assistant"
+        if not _is_degraded(final_message):
+            _semantic_store(request, lookup, agent_type, response_content)
+
+    # 写入在请求结束时由依赖项统一提交（或进入组提交缓冲区）
+    await _persist_turn(request, turn, response_content, agent_type, db=db)
+    _schedule_side_effects(request, turn)
+
+    logger.info(f"聊天请求处理完成: session_id={request.session_id}")
+
+    return {
+        "response": response_content,
+        "agent_type": agent_type,
+        "session_id": request.session_id
+    }
+
+
+async def _run_idempotent_turn(request: ChatRequest, deadline: Optional[float]) -> dict:
+    """
+    幂等请求的共享任务：在独立工作单元中读取上下文并完成写入
+
+    任务可能比发起它的请求活得更久（重试挂在同一个任务上），不能使用请求级会话；
+    准入名额也由任务占用：挂到运行中任务或重放已完成响应的重试不占用名额
+    """
+    # 超出并发上限时排队，队列满或排队超时返回503（等待者都会收到）
+    ticket = await admission_controller.acquire(request.user_id)
+    try:
+        turn = await run_in_threadpool(_load_turn, request)
+        return await _run_turn(request, turn, deadline)
+    finally:
+        ticket.release()
+
+
 @router.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, db: DBSession, http_request: Request):
     """
     Chat endpoint with message persistence
+
+    客户端断开时取消正在运行的Graph，本轮对话不保存；
+    到达截止时间（X-Request-Timeout或默认配置）时返回降级的部分回答。
+
+    携带Idempotency-Key请求头时，重试会挂到运行中的同一次请求，
+    或在TTL内重放已完成的响应（响应头Idempotent-Replayed: true）
     """
     logger.info(f"收到聊天请求: session_id={request.session_id}, message_length={len(request.message)}")
-    
+
+    # 截止时间从收到请求时开始计算
+    deadline = make_deadline(_request_timeout(http_request))
+    # 不支持的模型返回400
+    request.model = graph_registry.resolve_model(request.model)
+    idempotency_key = http_request.headers.get("Idempotency-Key")
+    ticket: Optional[AdmissionTicket] = None
+
     try:
-        # Check if session exists
-        existing = SessionService.get_session(request.session_id)
-        if not existing:
-            # Since the frontend generates session_id, we need to create with that ID
-            # But our create_session generates a new ID, so we need to check if it's a valid format
-            if request.session_id.startswith('session_'):
-                # Frontend-generated session, create it
-                print(f"Creating new session with ID from frontend: {request.session_id}")
-                # We need to modify create_session to accept session_id or create a version that does
-                # For now, let's use a workaround
-                with get_db() as db:
-                    from app.db.models import Session
-                    new_session = Session(
-                        session_id=request.session_id,
-                        user_id=request.user_id or "default_user",
-                        title="新对话"
-                    )
-                    db.add(new_session)
-            else:
-                # Create new session with auto-generated ID
-                request.session_id = SessionService.create_session(
-                    user_id=request.user_id,
-                    title="新对话"
-                )
-            logger.info(f"创建新会话: session_id={request.session_id}")
-        
-        # Get message count BEFORE saving user message
-        message_count = MessageService.get_message_count(request.session_id)
-        
-        # 检查是否有相同内容的用户消息（用于版本分组）
-        existing_user_msg_id = MessageService.find_user_message_by_content(
-            request.session_id, 
-            request.message
-        )
-        
-        # Save user message to database
-        # 如果是相同内容，不创建新的用户消息，而是使用现有的
-        if existing_user_msg_id:
-            logger.debug(f"找到相同内容的用户消息: message_id={existing_user_msg_id}, 将创建新版本")
-            user_message_id = existing_user_msg_id
-        else:
-            # 创建新的用户消息（parent_id为NULL，表示根节点）
-            user_message_id = MessageService.create_message(
-                session_id=request.session_id,
-                role="user",
-                content=request.message,
-                model=request.model,
-                parent_id=None,  # 用户消息是根节点
-                sibling_index=0
+        if idempotency_key:
+            # 先查幂等键：只有真正执行本轮对话的请求才获取准入名额（见_run_idempotent_turn）
+            response, replayed = await idempotency_store.run(
+                key=f"{request.user_id}:{idempotency_key}",
+                fingerprint=request_fingerprint(
+                    message=request.message,
+                    session_id=request.session_id,
+                    model=request.model
+                ),
+                factory=lambda: _run_idempotent_turn(request, deadline),
+                request=http_request
             )
-        
-        # Run the workflow
-        initial_state = {
-            "messages": [HumanMessage(content=request.message)],
-            "next": ""
-        }
-        result = graph.invoke(initial_state)
-        response_content = result['messages'][-1].content
-        
-        # Detect agent type
-        agent_type = "general_assistant"
-        if "搜索" in str(result.get('next', '')):
-            agent_type = "researcher"
-        elif "代码" in response_content or "```" in response_content:
-            agent_type = "coder"
-        
-        # Save assistant message as child of user message
-        # sibling_index会自动计算（同一父节点下的第几个子节点）
-        assistant_message_id = MessageService.create_message(
-            session_id=request.session_id,
-            role="assistant",
-            content=response_content,
-            agent_type=agent_type,
-            model=request.model,
-            parent_id=user_message_id,  # 助手消息的父节点是用户消息
-            sibling_index=None  # 自动计算
+            return JSONResponse(content=response, headers={"Idempotent-Replayed": "true"}) if replayed else response
+
+        # 超出并发上限时排队，队列满或排队超时返回503
+        ticket = await admission_controller.acquire(request.user_id)
+
+        # 数据库操作是同步的，放到线程池中执行，避免阻塞事件循环
+        turn = await run_in_threadpool(_prepare_turn, db, request)
+        # 结束只读事务并归还连接：Graph运行期间不占用连接池（无写入，不产生fsync）
+        db.commit()
+
+        return await _run_turn(request, turn, deadline, db=db, http_request=http_request)
+    except ClientDisconnected:
+        logger.info(f"客户端已断开，已取消本轮对话: session_id={request.session_id}")
+        return Response(status_code=499)  # Client Closed Request（nginx约定）
+    except BaseAPIException:
+        raise
+    except Exception as e:
+        logger.error(
+            f"聊天请求处理失败: session_id={request.session_id}",
+            exc_info=True,
+            extra={
+                "session_id": request.session_id,
+                "user_message": request.message[:100],  # 只记录前100个字符
+                "model": request.model
+            }
         )
-        
-        logger.info(f"助手消息创建成功: message_id={assistant_message_id}, agent_type={agent_type}")
-        
-        # Auto-generate title for first message (message_count was 0 before user message)
-        if message_count == 0:
-            SessionService.auto_generate_title(request.session_id, request.message)
-            logger.debug(f"自动生成会话标题: session_id={request.session_id}")
-        
-        # Update session timestamp
-        SessionService.update_session_timestamp(request.session_id)
-        
-        logger.info(f"聊天请求处理完成: session_id={request.session_id}")
-        
-        return {
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+
+def _sse(event: str, data: dict) -> str:
+    """格式化一条Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _final_ai_message(output) -> Optional[AIMessage]:
+    """从节点输出中提取最终回答（不含工具调用的AIMessage）"""
+    if not isinstance(output, dict):
+        return None
+    messages = output.get("messages") or []
+    if not messages:
+        return None
+    last = messages[-1]
+    if isinstance(last, AIMessage) and not last.tool_calls:
+        return last
+    return None
+
+
+def _has_tool_calls(message) -> bool:
+    """消息（或流式chunk）是否包含工具调用"""
+    if message is None:
+        return False
+    additional_kwargs = getattr(message, "additional_kwargs", None) or {}
+    return bool(
+        getattr(message, "tool_calls", None)
+        or getattr(message, "tool_call_chunks", None)
+        or additional_kwargs.get("tool_calls")
+    )
+
+
+def _chat_model_output(output) -> Optional[BaseMessage]:
+    """从on_chat_model_end的输出中提取模型消息（消息本身或LLMResult格式的字典）"""
+    if isinstance(output, BaseMessage):
+        return output
+    if isinstance(output, dict) and output.get("generations"):
+        generation = output["generations"][0][0]
+        if isinstance(generation, dict):
+            return generation.get("message")
+        return getattr(generation, "message", None)
+    return None
+
+
+async def _stream_turn(request: ChatRequest, turn: TurnContext, deadline: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    运行Graph并以SSE事件流的形式推送中间结果
+
+    事件类型:
+        router     - 路由决策
+        tool_start - 工具开始执行
+        tool_end   - 工具执行完成
+        token      - 助手回答的增量token（run_id标识产生它的模型调用）
+        discard    - 丢弃该run_id已推送的token（调用工具前的中间输出，或被最终回答取代）
+        done       - 回答完成（已持久化），response为完整回答
+        error      - 处理失败
+
+    客户端断开时StreamingResponse会取消本生成器，
+    取消沿await链传递到Graph中的LLM调用和工具执行，本轮对话不保存
+    """
+    agent_type: Optional[str] = None
+    final_message: Optional[AIMessage] = None
+    streamed: Dict[str, List[str]] = {}  # run_id -> 已推送的token
+    chunks: Dict[str, BaseMessage] = {}  # run_id -> 累积的流式输出（用于判断是否调用工具）
+    speculative: Dict[str, List[str]] = {}  # 路由确定前缓存的投机回答token
+
+    try:
+        lookup = await _semantic_lookup(request, turn)
+        if lookup is not None and lookup.hit:
+            # 语义缓存命中：跳过Router和Agent，直接推送缓存的回答
+            agent_type = lookup.route
+            final_message = AIMessage(content=lookup.answer)
+            yield _sse("router", {"next": agent_type, "cached": True})
+        else:
+            async with graph_registry.acquire(request.model) as entry, aclosing(
+                entry.graph.astream_events(_initial_state(request, turn, deadline), version="v1")
+            ) as events:
+                async for event in events:
+                    kind = event["event"]
+                    data = event.get("data", {})
+
+                    if kind == "on_chat_model_stream":
+                        chunk = data.get("chunk")
+                        content = getattr(chunk, "content", "")
+                        tags = event.get("tags", [])
+                        if ROUTER_TAG in tags:
+                            # Router的分类输出（例如标签模式的单个字母）不是回答内容
+                            continue
+                        run_id = str(event.get("run_id"))
+                        if chunk is not None:
+                            chunks[run_id] = chunks[run_id] + chunk if run_id in chunks else chunk
+                        if not content:
+                            continue
+                        if SPECULATIVE_TAG in tags and agent_type != "general_assistant":
+                            # 投机回答：路由确定前先缓存，路由到其他Agent时丢弃
+                            if agent_type is None:
+                                speculative.setdefault(run_id, []).append(content)
+                            continue
+                        streamed.setdefault(run_id, []).append(content)
+                        yield _sse("token", {"content": content, "run_id": run_id})
+
+                    elif kind == "on_chat_model_end":
+                        run_id = str(event.get("run_id"))
+                        chunk = chunks.pop(run_id, None)
+                        if _has_tool_calls(chunk) or _has_tool_calls(_chat_model_output(data.get("output"))):
+                            # 调用工具前的文字（例如"让我先运行一下代码"）不属于最终回答
+                            speculative.pop(run_id, None)
+                            if streamed.pop(run_id, None):
+                                yield _sse("discard", {"run_id": run_id})
+
+                    elif kind == "on_tool_start":
+                        yield _sse("tool_start", {"name": event["name"], "input": data.get("input")})
+
+                    elif kind == "on_tool_end":
+                        yield _sse("tool_end", {"name": event["name"], "output": data.get("output")})
+
+                    elif kind == "on_chain_end":
+                        output = data.get("output")
+                        # 第一个带有next字段的节点输出来自router
+                        if agent_type is None and isinstance(output, dict) and output.get("next") in ROUTES:
+                            agent_type = output["next"]
+                            yield _sse("router", {"next": agent_type})
+                            if agent_type == "general_assistant":
+                                for run_id, tokens in speculative.items():
+                                    streamed[run_id] = tokens
+                                    yield _sse("token", {"content": "".join(tokens), "run_id": run_id})
+                            speculative.clear()
+                        message = _final_ai_message(output)
+                        if message is not None:
+                            final_message = message
+
+        response_content = final_message.content if final_message else ""
+        agent_type = agent_type or "general_assistant"
+
+        # 只保留与最终回答一致的那次模型输出，其余（例如超时中断的部分输出）通知客户端丢弃；
+        # 最终回答没有增量输出时（LLM缓存命中、降级回答、模型不支持流式），一次性推送完整回答
+        final_streamed = False
+        for run_id, tokens in streamed.items():
+            if not final_streamed and "".join(tokens) == response_content:
+                final_streamed = True
+            else:
+                yield _sse("discard", {"run_id": run_id})
+        if not final_streamed and response_content:
+            yield _sse("token", {"content": response_content, "run_id": None})
+
+        if final_message is not None and not _is_degraded(final_message):
+            _semantic_store(request, lookup, agent_type, response_content)
+
+        assistant_message_id = await _persist_turn(request, turn, response_content, agent_type)
+        _schedule_side_effects(request, turn)
+        logger.info(f"流式聊天请求处理完成: session_id={request.session_id}")
+
+        yield _sse("done", {
             "response": response_content,
             "agent_type": agent_type,
-            "session_id": request.session_id
-        }
+            "session_id": request.session_id,
+            "message_id": assistant_message_id
+        })
+    except asyncio.CancelledError:
+        logger.info(f"客户端已断开，已取消流式对话: session_id={request.session_id}")
+        raise
     except Exception as e:
         logger.error(
-            f"聊天请求处理失败: session_id={request.session_id}",
+            f"流式聊天请求处理失败: session_id={request.session_id}",
             exc_info=True,
             extra={
                 "session_id": request.session_id,
-                "message": request.message[:100],  # 只记录前100个字符
+                "user_message": request.message[:100],
                 "model": request.model
             }
         )
+        yield _sse("error", {"detail": str(e)})
+
+
+async def _release_when_done(stream: AsyncIterator[str], ticket: AdmissionTicket) -> AsyncIterator[str]:
+    """流结束（包括客户端断开）时归还准入名额"""
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        ticket.release()
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, db: DBSession, http_request: Request):
+    """
+    流式聊天接口（Server-Sent Events）
+
+    逐步推送路由决策、工具调用事件和助手回答token，
+    流结束时保存助手消息
+    """
+    logger.info(f"收到流式聊天请求: session_id={request.session_id}, message_length={len(request.message)}")
+
+    deadline = make_deadline(_request_timeout(http_request))
+    request.model = graph_registry.resolve_model(request.model)
+    # 准入名额一直占用到流结束
+    ticket = await admission_controller.acquire(request.user_id)
+
+    try:
+        turn = await run_in_threadpool(_prepare_turn, db, request)
+    except Exception as e:
+        ticket.release()
+        logger.error(f"流式聊天请求准备失败: session_id={request.session_id}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        _release_when_done(_stream_turn(request, turn, deadline), ticket),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 禁用Nginx缓冲
+        },
+        # 流未开始就断开时生成器不会执行，由后台任务兜底归还名额
+        background=BackgroundTask(ticket.release)
+    )
+
+
+async def _run_batch_item(
+    index: int,
+    item: BatchChatItem,
+    batch: BatchChatRequest,
+    semaphore: asyncio.Semaphore,
+    timeout: Optional[float] = None
+) -> dict:
+    """处理批量请求中的一条（失败只影响该条）"""
+    started = time.perf_counter()
+    result = {"index": index, "id": item.id, "session_id": item.session_id}
+
+    # 先受本次请求的并发限制，再占用全局的批量名额
+    async with semaphore, _batch_semaphore:
+        # 每条的截止时间从开始执行时计算（排队时间不计入）
+        deadline = make_deadline(timeout)
+        try:
+            request = ChatRequest(
+                message=item.message,
+                session_id=item.session_id or f"batch_{index}",
+                user_id=batch.user_id,
+                model=batch.model
+            )
+            if item.session_id:
+                turn = await run_in_threadpool(_load_turn, request)
+            else:
+                turn = TurnContext(session_exists=False, message_count=0, user_message_id=None)
+
+            async with graph_registry.acquire(request.model) as entry:
+                state = await entry.graph.ainvoke(_initial_state(request, turn, deadline))
+            response_content = state['messages'][-1].content
+            agent_type = state.get('next') or "general_assistant"
+
+            if item.session_id:
+                result["message_id"] = await _persist_turn(request, turn, response_content, agent_type)
+                _schedule_side_effects(request, turn)
+                result["session_id"] = request.session_id
+
+            result.update(response=response_content, agent_type=agent_type)
+        except Exception as e:
+            logger.error(f"批量请求第{index}条处理失败: {e}", exc_info=True)
+            result["error"] = str(e)
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+async def _stream_batch(batch: BatchChatRequest, timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """按完成顺序逐行输出结果（NDJSON），最后输出汇总"""
+    # 调用方可以要求更低的并发；所有批量请求合计不超过BATCH_MAX_CONCURRENCY
+    limit = min(batch.max_concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(limit)
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_run_batch_item(index, item, batch, semaphore, timeout))
+        for index, item in enumerate(batch.items)
+    ]
+    failed = 0
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            failed += "error" in result
+            yield json.dumps({"type": "result", **result}, ensure_ascii=False, default=str) + "\n"
+
+        yield json.dumps({
+            "type": "summary",
+            "total": len(tasks),
+            "succeeded": len(tasks) - failed,
+            "failed": failed,
+            "concurrency": limit,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }) + "\n"
+    finally:
+        # 客户端断开时取消尚未完成的条目
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/chat/batch")
+async def chat_batch(batch: BatchChatRequest, http_request: Request):
+    """
+    批量聊天接口（NDJSON）
+
+    以受限的并发运行多条消息（所有批量请求共享BATCH_MAX_CONCURRENCY个名额），
+    每条完成后立即输出一行结果；最多BATCH_MAX_ITEMS条，超出时返回422；
+    条目带session_id时与普通对话一样读取历史并保存，否则只返回结果；
+    X-Request-Timeout请求头作用于每一条
+    """
+    batch.model = graph_registry.resolve_model(batch.model)
+
+    logger.info(f"收到批量聊天请求: items={len(batch.items)}, model={batch.model}")
+
+    return StreamingResponse(
+        _stream_batch(batch, _request_timeout(http_request)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from app.services.message import MessageService
+from app.api.v1.deps import DBSession
 
 router = APIRouter()
 
@@ -19,7 +20,7 @@ class MessageUpdate(BaseModel):
     content: str
 
 @router.post("/messages")
-async def create_message(message: MessageCreate):
+async def create_message(message: MessageCreate, db: DBSession):
     """创建新消息"""
     try:
         message_id = MessageService.create_message(
@@ -27,33 +28,34 @@ async def create_message(message: MessageCreate):
             role=message.role,
             content=message.content,
             agent_type=message.agent_type,
-            model=message.model
+            model=message.model,
+            db=db
         )
         return {"message_id": message_id, "message": "Message created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/messages/{message_id}")
-async def update_message(message_id: str, update: MessageUpdate):
+async def update_message(message_id: str, update: MessageUpdate, db: DBSession):
     """更新消息内容"""
-    success = MessageService.update_message_content(message_id, update.content)
+    success = MessageService.update_message(message_id, update.content, db=db)
     if not success:
         raise HTTPException(status_code=404, detail="Message not found")
     return {"message": "Message updated successfully"}
 
 @router.delete("/messages/{message_id}")
-async def delete_message(message_id: str):
+async def delete_message(message_id: str, db: DBSession):
     """删除消息"""
-    success = MessageService.delete_message(message_id)
+    success = MessageService.delete_message(message_id, db=db)
     if not success:
         raise HTTPException(status_code=404, detail="Message not found")
     return {"message": "Message deleted successfully"}
 
 @router.delete("/messages/{message_id}/after")
-async def delete_messages_after(message_id: str):
+async def delete_messages_after(message_id: str, db: DBSession):
     """删除某条消息之后的所有消息（用于编辑功能）"""
     try:
-        MessageService.delete_messages_after(message_id)
+        MessageService.delete_messages_after(message_id, db=db)
         return {"message": "Messages deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,87 @@
+"""
+Metrics API Endpoints
+运行时指标：缓存命中率（精确/语义）、后台队列、写入缓冲区
+"""
+from typing import Optional
+
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+
+from app.agents.cache import llm_cache
+from app.agents.registry import graph_registry
+from app.agents.embedding_router import embedding_router
+from app.agents.route_cache import route_decision_cache
+from app.agents.router_rules import rule_router
+from app.agents.speculative import speculation_stats
+from app.core.admission import admission_controller
+from app.services.background import background_queue
+from app.services.idempotency import idempotency_store
+from app.services.route_logger import route_decision_logger
+from app.services.semantic_cache import semantic_cache
+from app.services.write_behind import message_write_buffer
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """获取所有运行时指标"""
+    return {
+        "llm_cache": llm_cache.get_stats(),
+        "semantic_cache": semantic_cache.get_stats(),
+        "graph_registry": graph_registry.get_stats(),
+        "router_rules": rule_router.get_stats(),
+        "embedding_router": embedding_router.get_stats(),
+        "route_decision_cache": route_decision_cache.get_stats(),
+        "speculation": speculation_stats.get_stats(),
+        "admission": admission_controller.get_stats(),
+        "idempotency": idempotency_store.get_stats(),
+        "background_queue": background_queue.get_stats(),
+        "message_write_buffer": message_write_buffer.get_stats(),
+        "route_logger": route_decision_logger.get_stats(),
+    }
+
+
+@router.get("/metrics/admission")
+async def get_admission_metrics():
+    """获取准入控制统计（在途请求数、队列深度、排队时间）"""
+    return admission_controller.get_stats()
+
+
+@router.get("/metrics/cache")
+async def get_cache_metrics():
+    """获取LLM响应缓存的命中统计"""
+    return llm_cache.get_stats()
+
+
+@router.delete("/metrics/cache")
+async def clear_cache():
+    """清空LLM响应缓存（包括SQLite中持久化的条目）"""
+    await run_in_threadpool(llm_cache.clear)
+    return {"message": "LLM cache cleared"}
+
+
+@router.get("/metrics/semantic-cache")
+async def get_semantic_cache_metrics():
+    """获取语义缓存的命中统计"""
+    return semantic_cache.get_stats()
+
+
+@router.delete("/metrics/semantic-cache")
+async def invalidate_semantic_cache(
+    route: Optional[str] = None,
+    model: Optional[str] = None,
+    expired_only: bool = False
+):
+    """
+    使语义缓存失效
+
+    - expired_only=true: 只清理已过期的条目
+    - 指定route/model: 只删除匹配的条目（例如 route=researcher）
+    - 不带参数: 清空全部
+    """
+    if expired_only:
+        removed = await run_in_threadpool(semantic_cache.purge_expired)
+    else:
+        removed = await run_in_threadpool(semantic_cache.invalidate, route, model)
+    return {"removed": removed}
@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from app.services.project import ProjectService
+from app.api.v1.deps import DBSession
 
 router = APIRouter()
 
@@ -22,10 +23,10 @@ class ProjectUpdate(BaseModel):
     icon: Optional[str] = None
 
 @router.get("/projects")
-async def get_projects(user_id: str = "default_user"):
+async def get_projects(db: DBSession, user_id: str = "default_user"):
     """获取所有项目"""
     try:
-        projects = ProjectService.get_all_projects(user_id)
+        projects = ProjectService.get_all_projects(db=db)
         return {"projects": projects}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -36,37 +37,38 @@ async def get_default_projects():
     return {"projects": ProjectService.get_default_projects()}
 
 @router.get("/projects/{project_id}")
-async def get_project(project_id: str):
+async def get_project(project_id: str, db: DBSession):
     """获取项目详情"""
-    project = ProjectService.get_project(project_id)
+    project = ProjectService.get_project(project_id, db=db)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
 @router.post("/projects")
-async def create_project(project: ProjectCreate):
+async def create_project(project: ProjectCreate, db: DBSession):
     """创建新项目"""
     try:
         project_id = ProjectService.create_project(
             name=project.name,
-            user_id=project.user_id,
             description=project.description,
             color=project.color,
-            icon=project.icon
+            icon=project.icon,
+            db=db
         )
         return {"project_id": project_id, "message": "Project created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/projects/{project_id}")
-async def update_project(project_id: str, update: ProjectUpdate):
+async def update_project(project_id: str, update: ProjectUpdate, db: DBSession):
     """更新项目信息"""
     success = ProjectService.update_project(
         project_id=project_id,
         name=update.name,
         description=update.description,
         color=update.color,
-        icon=update.icon
+        icon=update.icon,
+        db=db
     )
     
     if not success:
@@ -75,9 +77,9 @@ async def update_project(project_id: str, update: ProjectUpdate):
     return {"message": "Project updated successfully"}
 
 @router.delete("/projects/{project_id}")
-async def delete_project(project_id: str):
+async def delete_project(project_id: str, db: DBSession):
     """删除项目"""
-    success = ProjectService.delete_project(project_id)
+    success = ProjectService.delete_project(project_id, db=db)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project deleted successfully"}
@@ -4,7 +4,6 @@ Router监控API - 路由决策历史和统计
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-from datetime import datetime
 import sqlite3
 
 router = APIRouter()
@@ -21,7 +20,13 @@ def init_router_db():
                   user_message TEXT,
                   routed_to TEXT,
                   reasoning TEXT,
-                  timestamp TEXT)''')
+                  timestamp TEXT,
+                  decided_by TEXT)''')
+    # 旧表补充decided_by列（rule: 规则路由, embedding: 向量路由, reuse: 重新生成复用,
+    # decision_cache: 决策缓存, cache: LLM缓存命中, llm: LLM分类, llm:<模型>: 级联路由的小模型）
+    columns = {row[1] for row in c.execute("PRAGMA table_info(route_history)")}
+    if "decided_by" not in columns:
+        c.execute("ALTER TABLE route_history ADD COLUMN decided_by TEXT")
     conn.commit()
     conn.close()
 
@@ -34,6 +39,7 @@ class RouteHistoryItem(BaseModel):
     routed_to: str
     reasoning: str
     timestamp: str
+    decided_by: Optional[str] = None
 
 class RouteStats(BaseModel):
     total_routes: int
@@ -43,6 +49,8 @@ class RouteStats(BaseModel):
     researcher_percentage: float
     coder_percentage: float
     general_percentage: float
+    decided_by_counts: Dict[str, int] = {}
+    rule_hit_rate: float = 0.0
 
 @router.get("/routes/history", response_model=List[RouteHistoryItem])
 async def get_route_history(limit: int = 50):
@@ -51,7 +59,7 @@ async def get_route_history(limit: int = 50):
         conn = sqlite3.connect(DB_PATH)
         c = conn.cursor()
         c.execute("""
-            SELECT id, session_id, user_message, routed_to, reasoning, timestamp
+            SELECT id, session_id, user_message, routed_to, reasoning, timestamp, decided_by
             FROM route_history
             ORDER BY timestamp DESC
             LIMIT ?
@@ -67,7 +75,8 @@ async def get_route_history(limit: int = 50):
                 user_message=row[2],
                 routed_to=row[3],
                 reasoning=row[4],
-                timestamp=row[5]
+                timestamp=row[5],
+                decided_by=row[6]
             )
             for row in rows
         ]
@@ -88,6 +97,10 @@ async def get_route_stats():
         # 各Agent统计
         c.execute("SELECT routed_to, COUNT(*) FROM route_history GROUP BY routed_to")
         counts = dict(c.fetchall())
+        
+        # 决策来源统计（早于该列的记录为NULL，按llm计）
+        c.execute("SELECT COALESCE(decided_by, 'llm'), COUNT(*) FROM route_history GROUP BY 1")
+        decided_by_counts = dict(c.fetchall())
         conn.close()
         
         researcher_count = counts.get("researcher", 0)
@@ -101,7 +114,9 @@ async def get_route_stats():
             general_count=general_count,
             researcher_percentage=round(researcher_count / total * 100, 2) if total > 0 else 0,
             coder_percentage=round(coder_count / total * 100, 2) if total > 0 else 0,
-            general_percentage=round(general_count / total * 100, 2) if total > 0 else 0
+            general_percentage=round(general_count / total * 100, 2) if total > 0 else 0,
+            decided_by_counts=decided_by_counts,
+            rule_hit_rate=round(decided_by_counts.get("rule", 0) / total * 100, 2) if total > 0 else 0
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -113,7 +128,7 @@ async def get_session_routes(session_id: str):
         conn = sqlite3.connect(DB_PATH)
         c = conn.cursor()
         c.execute("""
-            SELECT id, session_id, user_message, user_message, routed_to, reasoning, timestamp
+            SELECT id, session_id, user_message, routed_to, reasoning, timestamp, decided_by
             FROM route_history
             WHERE session_id = ?
             ORDER BY timestamp ASC
@@ -129,20 +144,15 @@ async def get_session_routes(session_id: str):
                 user_message=row[2],
                 routed_to=row[3],
                 reasoning=row[4],
-                timestamp=row[5]
+                timestamp=row[5],
+                decided_by=row[6]
             )
             for row in rows
         ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def log_route_decision(session_id: str, user_message: str, routed_to: str, reasoning: str):
-    """记录路由决策（供Router调用）"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO route_history (session_id, user_message, routed_to, reasoning, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-    """, (session_id, user_message, routed_to, reasoning, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+def log_route_decision(session_id: str, user_message: str, routed_to: str, reasoning: str, decided_by: str = "llm"):
+    """记录路由决策（供Router调用；放入批量写入队列，由后台线程写入）"""
+    from app.services.route_logger import route_decision_logger
+    route_decision_logger.log(session_id, user_message, routed_to, reasoning, decided_by=decided_by)
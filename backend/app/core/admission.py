@@ -0,0 +1,204 @@
+"""
+准入控制模块（负载削减）
+
+在聊天接口前限制同时运行的请求数：
+- 全局并发上限 + 每个用户的并发上限
+  （user_id由客户端提供；前端未登录时共用的ID（ADMISSION_SHARED_USER_IDS）不受每用户上限约束）
+- 超出上限的请求进入短的有界等待队列（FIFO，被用户上限阻塞的请求不挡住其他用户）
+- 队列已满或等待超时时立即返回 503 + Retry-After
+
+接受的请求延迟可预期，而不是所有请求一起变慢、一起触发上游429。
+"""
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Sequence
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Waiter:
+    """等待队列中的一个请求"""
+    user_id: str
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class AdmissionTicket:
+    """已获得的执行名额（release可重复调用，只生效一次）"""
+
+    def __init__(self, controller: Optional["AdmissionController"], user_id: str):
+        self._controller = controller
+        self.user_id = user_id
+
+    def release(self) -> None:
+        if self._controller is not None:
+            controller, self._controller = self._controller, None
+            controller._release(self.user_id)
+
+
+class AdmissionController:
+    """聊天请求准入控制器"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_in_flight: int = 32,
+        max_in_flight_per_user: int = 4,
+        max_queue: int = 64,
+        max_wait: float = 5.0,
+        retry_after: int = 2,
+        shared_user_ids: Sequence[str] = ()
+    ):
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_user = max_in_flight_per_user
+        self.shared_user_ids = set(shared_user_ids)  # 多个客户端共用的ID，只受全局上限约束
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+
+        self._in_flight = 0
+        self._per_user: Dict[str, int] = defaultdict(int)
+        self._waiters: Deque[_Waiter] = deque()
+
+        # 统计信息
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self._wait_times: Deque[float] = deque(maxlen=1000)  # 最近的排队时间（秒）
+
+    async def acquire(self, user_id: str) -> AdmissionTicket:
+        """
+        获取一个执行名额（需要时排队等待），用完后调用ticket.release()
+
+        Raises:
+            ServiceUnavailableError: 队列已满或等待超时
+        """
+        if not self.enabled:
+            return AdmissionTicket(None, user_id)
+        await self._acquire(user_id)
+        return AdmissionTicket(self, user_id)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str) -> AsyncIterator[AdmissionTicket]:
+        """在上下文中占用一个执行名额"""
+        ticket = await self.acquire(user_id)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取准入控制统计信息"""
+        waits = sorted(self._wait_times)
+        return {
+            "enabled": self.enabled,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_in_flight_per_user": self.max_in_flight_per_user,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                "p50": round(_percentile(waits, 50) * 1000, 2),
+                "p95": round(_percentile(waits, 95) * 1000, 2),
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+        }
+
+    def _can_run(self, user_id: str) -> bool:
+        return self._in_flight < self.max_in_flight and (
+            user_id in self.shared_user_ids
+            or self._per_user.get(user_id, 0) < self.max_in_flight_per_user
+        )
+
+    def _grant(self, user_id: str) -> None:
+        self._in_flight += 1
+        self._per_user[user_id] += 1
+        self.admitted += 1
+
+    async def _acquire(self, user_id: str) -> None:
+        if self._can_run(user_id):
+            self._grant(user_id)
+            self._wait_times.append(0.0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"准入控制：队列已满，拒绝请求 user_id={user_id}")
+            raise ServiceUnavailableError("服务繁忙，请稍后重试", retry_after=self.retry_after)
+
+        waiter = _Waiter(user_id=user_id, future=asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done():
+                # 名额已经分配给本请求，但调用方不再等待：归还名额
+                self._release(user_id)
+            else:
+                waiter.future.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            logger.warning(f"准入控制：排队超时，拒绝请求 user_id={user_id}")
+            raise ServiceUnavailableError("服务繁忙，请稍后重试", retry_after=self.retry_after)
+
+        self._wait_times.append(time.perf_counter() - waiter.enqueued_at)
+
+    def _release(self, user_id: str) -> None:
+        self._in_flight -= 1
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """按FIFO顺序把空出的名额分给可以运行的等待者"""
+        for waiter in list(self._waiters):
+            if self._in_flight >= self.max_in_flight:
+                break
+            if not self._can_run(waiter.user_id):
+                continue
+            self._waiters.remove(waiter)
+            self._grant(waiter.user_id)
+            waiter.future.set_result(None)
+
+
+def _percentile(sorted_values: "list[float]", percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(math.ceil(len(sorted_values) * percent / 100) - 1, 0)
+    return sorted_values[index]
+
+
+# 单例实例（全局使用）
+admission_controller = AdmissionController(
+    enabled=settings.ADMISSION_ENABLED,
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_in_flight_per_user=settings.ADMISSION_MAX_IN_FLIGHT_PER_USER,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    max_wait=settings.ADMISSION_MAX_WAIT,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+    shared_user_ids=settings.ADMISSION_SHARED_USER_IDS
+)
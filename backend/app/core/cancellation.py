@@ -0,0 +1,48 @@
+"""
+请求取消模块
+
+客户端断开（关闭页面、点击停止）后取消正在运行的Graph，
+取消会沿着 await 链传递到 LLM 调用和工具执行
+"""
+import asyncio
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import Request
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """客户端在请求完成前断开连接"""
+
+
+async def run_until_disconnected(
+    request: Request,
+    awaitable: Awaitable[T],
+    poll_interval: Optional[float] = None
+) -> T:
+    """
+    运行awaitable，期间定期检查客户端是否断开
+
+    Raises:
+        ClientDisconnected: 客户端已断开，任务已被取消
+    """
+    poll_interval = poll_interval or settings.DISCONNECT_POLL_INTERVAL
+    task = asyncio.ensure_future(awaitable)
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
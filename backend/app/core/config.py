@@ -16,6 +16,12 @@ class Environment(str, Enum):
     TESTING = "testing"
 
 
+class RouterMode(str, Enum):
+    """路由模式枚举"""
+    STRUCTURED = "structured"  # 结构化输出（含理由）
+    LABEL = "label"  # 只输出一个标签字母（输出token最少）
+
+
 class Settings(BaseSettings):
     # 基础配置
     PROJECT_NAME: str = "Agentic Chat"
@@ -55,7 +61,7 @@ class Settings(BaseSettings):
     CORS_ALLOW_METHODS: Union[List[str], str] = ["*"]
     CORS_ALLOW_HEADERS: Union[List[str], str] = ["*"]
     
-    @field_validator("CORS_ORIGINS", "CORS_ALLOW_METHODS", "CORS_ALLOW_HEADERS", mode="before")
+    @field_validator("CORS_ORIGINS", "CORS_ALLOW_METHODS", "CORS_ALLOW_HEADERS", "LLM_CACHE_AGENTS", "ROUTER_CASCADE_MODELS", "ADMISSION_SHARED_USER_IDS", mode="before")
     @classmethod
     def parse_list(cls, v):
         """解析列表类型的环境变量（支持逗号分隔的字符串）"""
@@ -68,6 +74,15 @@ class Settings(BaseSettings):
     GZIP_ENABLED: bool = True
     GZIP_MIN_SIZE: int = 1000  # 字节
     
+    # 准入控制配置（聊天接口的并发上限和等待队列，超出时返回503）
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = 32  # 全局同时处理的聊天请求数
+    ADMISSION_MAX_IN_FLIGHT_PER_USER: int = 4  # 每个用户同时处理的聊天请求数
+    ADMISSION_SHARED_USER_IDS: Union[List[str], str] = ["default_user"]  # 多个客户端共用的user_id（前端默认值），不受每用户上限约束
+    ADMISSION_MAX_QUEUE: int = 64  # 等待队列长度，队列满时立即拒绝
+    ADMISSION_MAX_WAIT: float = 5.0  # 最长排队时间（秒）
+    ADMISSION_RETRY_AFTER: int = 2  # 503响应的Retry-After（秒）
+    
     # 限流配置
     RATE_LIMIT_ENABLED: bool = True
     RATE_LIMIT_DEFAULT: str = "60/minute"  # slowapi 格式
@@ -81,10 +96,107 @@ class Settings(BaseSettings):
     DATABASE_POOL_SIZE: int = 5
     DATABASE_MAX_OVERFLOW: int = 10
     
+    # 后台任务队列配置（响应返回后的非关键写入）
+    BACKGROUND_QUEUE_MAX_SIZE: int = 10000
+    BACKGROUND_MAX_RETRIES: int = 3
+    BACKGROUND_RETRY_BASE_DELAY: float = 0.5  # 秒，指数退避
+    BACKGROUND_FLUSH_TIMEOUT: float = 10.0  # 秒，关闭时排空队列的最长等待时间
+    
+    # 消息写入组提交（write-behind）：并发写入合并为一个事务
+    MESSAGE_WRITE_BEHIND_ENABLED: bool = False
+    MESSAGE_WRITE_BEHIND_MAX_BATCH: int = 100  # 每批最多写入数
+    MESSAGE_WRITE_BEHIND_MAX_DELAY_MS: float = 5.0  # 收集窗口（毫秒）
+    
+    # 路由决策日志的批量写入（后台线程，executemany + 单事务）
+    ROUTE_LOG_QUEUE_SIZE: int = 10000  # 队列容量，满时丢弃并计数
+    ROUTE_LOG_MAX_BATCH: int = 200  # 每批最多写入数
+    ROUTE_LOG_FLUSH_INTERVAL: float = 1.0  # 秒，收集一批的最长等待时间
+    
     # OpenAI配置
     OPENAI_API_KEY: str
     OPENAI_BASE_URL: str | None = None  # 可选，用于自定义API端点
     OPENAI_MODEL: str = "gpt-4o"  # 默认模型
+    OPENAI_TIMEOUT: float = 60.0  # 单次LLM请求超时（秒）
+    OPENAI_MAX_RETRIES: int = 1  # LLM请求失败重试次数
+    MODEL_REGISTRY_MAX_ENTRIES: int = 4  # 同时缓存的模型Graph数量（LRU淘汰）
+    MODEL_MAX_CONCURRENCY: int = 16  # 每个模型的并发请求上限
+    BATCH_MAX_ITEMS: int = 500  # 批量接口单次最多条目数
+    BATCH_MAX_CONCURRENCY: int = 4  # 所有批量请求合计的并发上限（为交互请求保留模型并发名额）
+    REQUEST_TIMEOUT_SECONDS: float = 120.0  # 聊天请求默认截止时间（秒），可用X-Request-Timeout请求头覆盖，<=0表示不限制
+    REQUEST_TIMEOUT_MAX_SECONDS: float = 300.0  # 请求头可设置的最大截止时间（秒）
+    IDEMPOTENCY_TTL_SECONDS: float = 3600  # Idempotency-Key对应响应的保留时间（秒）
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000  # 最多保留的幂等键数量
+    DISCONNECT_POLL_INTERVAL: float = 0.5  # 检测客户端断开的轮询间隔（秒）
+    CODE_EXECUTION_TIMEOUT: float = 30.0  # execute_python子进程的最长执行时间（秒），<=0表示不限制
+    
+    # 对话历史配置（按token预算从最新一轮向前打包）
+    CONTEXT_TOKEN_BUDGET: int = 4000  # 默认历史token预算（含本轮用户消息）
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {}  # 按模型覆盖，JSON格式: {"gpt-3.5-turbo": 2000}
+    
+    # 会话记忆配置（滚动摘要）
+    MEMORY_SUMMARY_ENABLED: bool = True
+    MEMORY_SUMMARY_EVERY_TURNS: int = 10  # 每累积K轮未摘要的对话，折叠一次
+    MEMORY_RECENT_TURNS: int = 6  # 始终保留原文的最近轮次数
+    MEMORY_SUMMARY_MODEL: str | None = None  # 摘要模型，默认使用OPENAI_MODEL
+    MEMORY_SUMMARY_MAX_WORDS: int = 500  # 摘要长度上限（字）
+    
+    # 规则路由（关键词/正则快速路径，无法确定时再调用LLM路由）
+    ROUTER_RULES_ENABLED: bool = True
+    ROUTER_RULES: Dict[str, Dict[str, List[str]]] = {}  # JSON: {"coder": {"keywords": [...], "patterns": [...]}}，为空时使用默认规则
+    
+    # 同一步中多个工具调用并发执行时，每个工具的并发上限
+    TOOL_MAX_CONCURRENCY: int = 4
+    TOOL_CONCURRENCY_LIMITS: Dict[str, int] = {}  # 按工具名覆盖，例如 {"execute_python": 2}
+    
+    # Agent工具循环预算（每轮对话，<=0表示不限制），用尽后不再调用工具、直接给出最终回答
+    AGENT_MAX_TOOL_ITERATIONS: int = 5  # 最多的工具调用轮数
+    AGENT_MAX_TOKENS: int = 50000  # 累计token上限
+    AGENT_MAX_SECONDS: float = 90  # 墙钟时间上限（秒）
+    AGENT_BUDGETS: Dict[str, Dict[str, float]] = {}  # 按Agent覆盖，例如 {"coder": {"max_tool_iterations": 8}}
+    
+    # 路由模式：structured 结构化输出（含理由）；label 只输出一个标签字母（输出token最少）
+    ROUTER_MODE: RouterMode = RouterMode.STRUCTURED
+    ROUTER_LABEL_MAX_TOKENS: int = 1
+    ROUTER_LABEL_LOGIT_BIAS: bool = True  # 用logit_bias把输出限制为标签（不支持的兼容接口可关闭）
+    ROUTER_REASONING_SAMPLE_RATE: float = 0.05  # 标签模式下仍生成理由的请求比例（用于监控）
+    
+    # 级联路由：依次用这些小模型分类，置信度达到阈值即采用，否则升级到下一级（最后是请求的模型）
+    ROUTER_CASCADE_MODELS: Union[List[str], str] = []  # 逗号分隔，例如 gpt-4o-mini
+    ROUTER_CASCADE_THRESHOLD: float = 0.8
+    
+    # 投机执行：Router分类的同时运行general_assistant，路由一致时直接使用其回答
+    ROUTER_SPECULATIVE_ENABLED: bool = False
+    
+    # 路由决策缓存（规范化消息 + 最近上下文 -> 路由）
+    ROUTER_DECISION_CACHE_ENABLED: bool = True
+    ROUTER_DECISION_CACHE_MAX_SIZE: int = 5000
+    ROUTER_DECISION_CACHE_TTL_SECONDS: float = 3600
+    ROUTER_DECISION_CONTEXT_MESSAGES: int = 2  # 缓存键包含的上下文消息数（0表示只看本轮消息）
+    
+    # 向量路由（基于route_history训练的本地分类器，置信度不足时调用LLM路由）
+    ROUTER_EMBEDDING_ENABLED: bool = False
+    ROUTER_EMBEDDING_METHOD: str = "knn"  # knn 或 centroid
+    ROUTER_EMBEDDING_K: int = 15  # knn的近邻数
+    ROUTER_EMBEDDING_THRESHOLD: float = 0.8  # 置信度阈值（knn为加权票数占比，centroid为softmax概率）
+    ROUTER_EMBEDDING_MIN_SIMILARITY: float = 0.75  # 最近样本的最低余弦相似度
+    ROUTER_EMBEDDING_MIN_EXAMPLES: int = 50  # 样本数不足时不启用
+    ROUTER_EMBEDDING_MAX_EXAMPLES: int = 5000  # 最多使用的最近样本数
+    ROUTER_EMBEDDING_REBUILD_INTERVAL: float = 3600  # 索引重建间隔（秒）
+    
+    # LLM响应缓存（精确匹配，所有Agent均为temperature=0）
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_AGENTS: Union[List[str], str] = ["router", "general_assistant"]  # 启用缓存的Agent，逗号分隔
+    LLM_CACHE_MAX_SIZE: int = 1000  # 内存中最多缓存的响应数（LRU淘汰）
+    LLM_CACHE_TTL_SECONDS: float = 3600  # 缓存有效期（秒）
+    LLM_CACHE_PERSIST: bool = False  # 是否持久化到SQLite（重启后保留）
+    LLM_CACHE_DB_PATH: str = "data/llm_cache.db"
+    
+    # 语义缓存（近似问题复用回答，需要安装chromadb）
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # 余弦相似度阈值
+    SEMANTIC_CACHE_TTL_SECONDS: float = 86400  # 默认有效期（秒）
+    SEMANTIC_CACHE_ROUTE_TTLS: Dict[str, float] = {"researcher": 600}  # 按路由覆盖，0表示不缓存
+    SEMANTIC_CACHE_DIR: str = "./data/semantic_cache"
     
     # 其他API
     ANTHROPIC_API_KEY: str | None = None
@@ -3,10 +3,16 @@
 
 管理应用启动和关闭时需要执行的操作
 """
+import asyncio
+
 from fastapi import FastAPI
 
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.services.background import background_queue
+from app.services.memory import MemoryService
+from app.services.route_logger import route_decision_logger
+from app.services.write_behind import message_write_buffer
 
 logger = get_logger(__name__)
 
@@ -21,6 +27,15 @@ async def startup_event(app: FastAPI) -> None:
     - 注册服务发现
     - 加载模型等
     """
+    # 启动后台任务队列
+    await background_queue.start()
+    
+    # 启动消息写入缓冲区（组提交，需通过配置开启）
+    await message_write_buffer.start()
+    
+    # 启动路由决策日志的写入线程
+    route_decision_logger.start()
+    
     # 存储应用级别的状态
     app.state.ready = True
     
@@ -43,6 +58,12 @@ async def shutdown_event(app: FastAPI) -> None:
     """
     app.state.ready = False
     
+    # 等待进行中的摘要折叠，再提交缓冲区中剩余的消息写入、排空后台任务队列，确保写入落盘
+    await MemoryService.flush(timeout=settings.BACKGROUND_FLUSH_TIMEOUT)
+    await message_write_buffer.flush(timeout=settings.BACKGROUND_FLUSH_TIMEOUT)
+    await background_queue.flush(timeout=settings.BACKGROUND_FLUSH_TIMEOUT)
+    await asyncio.to_thread(route_decision_logger.flush, settings.BACKGROUND_FLUSH_TIMEOUT)
+    
     # 可以添加更多清理逻辑
     # 例如：关闭 AI 模型连接
     # await cleanup_models()
@@ -3,6 +3,8 @@
 
 定义自定义异常类和全局异常处理器
 """
+from typing import Dict, Optional
+
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
@@ -16,9 +18,15 @@ logger = logging.getLogger(__name__)
 class BaseAPIException(Exception):
     """基础API异常类"""
     
-    def __init__(self, message: str, status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR):
+    def __init__(
+        self,
+        message: str,
+        status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR,
+        headers: Optional[Dict[str, str]] = None
+    ):
         self.message = message
         self.status_code = status_code
+        self.headers = headers
         super().__init__(self.message)
 
 
@@ -71,6 +79,17 @@ class RateLimitError(BaseAPIException):
         super().__init__(message, status.HTTP_429_TOO_MANY_REQUESTS)
 
 
+class ServiceUnavailableError(BaseAPIException):
+    """服务过载异常（负载削减）"""
+    
+    def __init__(self, message: str = "Service temporarily unavailable", retry_after: int = 1):
+        super().__init__(
+            message,
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
 class DatabaseError(BaseAPIException):
     """数据库错误异常"""
     
@@ -110,7 +129,8 @@ def setup_exception_handlers(app: FastAPI) -> None:
                 "detail": exc.message,
                 "type": type(exc).__name__,
                 "request_id": request_id,
-            }
+            },
+            headers=exc.headers
         )
     
     @app.exception_handler(RequestValidationError)
@@ -181,6 +181,23 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         return response
 
 
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    Gzip 压缩中间件（跳过流式接口）
+    
+    压缩器会缓冲小块数据，导致 SSE 事件和 NDJSON 行被延迟推送，
+    因此流式接口直接透传，不做压缩
+    """
+    
+    STREAM_PATH_SUFFIXES = ("/stream", "/batch")
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"].endswith(self.STREAM_PATH_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     简单限流中间件（基于内存）
@@ -309,7 +326,7 @@ def setup_middleware(app: FastAPI) -> None:
     # === 5. Gzip 压缩 ===
     if settings.GZIP_ENABLED:
         app.add_middleware(
-            GZipMiddleware,
+            StreamingAwareGZipMiddleware,
             minimum_size=settings.GZIP_MIN_SIZE
         )
         logger.info(f"✅ Gzip compression enabled (min: {settings.GZIP_MIN_SIZE} bytes)")
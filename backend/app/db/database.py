@@ -5,6 +5,7 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
+from typing import Optional
 from app.db.models import Base
 from app.core.config import settings
 import logging
@@ -87,3 +88,24 @@ def get_db() -> Session:
         raise
     finally:
         db.close()
+
+
+@contextmanager
+def use_db(db: Optional[Session] = None) -> Session:
+    """
+    复用调用方传入的数据库会话，否则打开一个独立会话
+    
+    传入的会话（例如请求级工作单元）由调用方负责提交；
+    未传入时行为与 get_db() 相同，退出时自动提交。
+    
+    Usage:
+        def some_service_method(..., db: Optional[Session] = None):
+            with use_db(db) as db:
+                db.query(...)
+    """
+    if db is not None:
+        yield db
+        return
+    
+    with get_db() as session:
+        yield session
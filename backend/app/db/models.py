@@ -26,6 +26,7 @@ class Session(Base):
     # Relationships - use passive_deletes to let database handle cascade
     messages = relationship('Message', back_populates='session', cascade='all, delete', passive_deletes=True)
     project = relationship('Project', back_populates='sessions')
+    memory = relationship('SessionMemory', back_populates='session', uselist=False, cascade='all, delete', passive_deletes=True)
 
 
 class Message(Base):
@@ -50,6 +51,20 @@ class Message(Base):
     parent = relationship('Message', remote_side=[message_id], backref='children')
 
 
+class SessionMemory(Base):
+    """会话记忆模型 - 滚动摘要（与会话一对一）"""
+    __tablename__ = 'session_memory'
+    
+    session_id = Column(String, ForeignKey('sessions.session_id', ondelete='CASCADE'), primary_key=True)
+    summary = Column(Text, nullable=False, default='')
+    summarized_until = Column(Integer, nullable=True)  # 已并入摘要的最后一条用户消息ID
+    summarized_turns = Column(Integer, default=0)  # 已并入摘要的轮次数
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    session = relationship('Session', back_populates='memory')
+
+
 class Project(Base):
     """项目模型"""
     __tablename__ = 'projects'
@@ -31,6 +31,16 @@ CREATE TABLE IF NOT EXISTS messages (
     FOREIGN KEY (parent_id) REFERENCES messages(message_id) ON DELETE CASCADE
 );
 
+-- Session Memory (会话滚动摘要，与会话一对一)
+CREATE TABLE IF NOT EXISTS session_memory (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_until INTEGER,  -- 已并入摘要的最后一条用户消息ID
+    summarized_turns INTEGER DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
+);
+
 -- Projects (项目表)
 CREATE TABLE IF NOT EXISTS projects (
     project_id TEXT PRIMARY KEY,
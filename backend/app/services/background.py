@@ -0,0 +1,166 @@
+"""
+Background Queue - 响应返回后执行的非关键写入
+
+- 进程内 asyncio 队列，由单个 worker 顺序消费（SQLite 只有一个写者）
+- 任务是同步函数，在线程中执行，不阻塞事件循环
+- 失败后按指数退避重试
+- 应用关闭时排空队列（见 app.core.events.shutdown_event）
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackgroundJob:
+    """一个待执行的后台任务"""
+    func: Callable[..., Any]
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+
+    @property
+    def name(self) -> str:
+        return getattr(self.func, "__qualname__", repr(self.func))
+
+
+class BackgroundQueue:
+    """后台任务队列"""
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        max_retries: int = 3,
+        retry_base_delay: float = 0.5
+    ):
+        self.max_size = max_size
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # 统计信息
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        """启动worker（在应用启动时调用）"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._worker = asyncio.create_task(self._run())
+        logger.info("✅ Background queue started")
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """
+        提交后台任务（线程安全）
+
+        worker未启动时（脚本、测试等场景）直接同步执行
+        """
+        job = BackgroundJob(func=func, args=args, kwargs=kwargs)
+
+        if not self.running:
+            self._execute_inline(job)
+            return
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        if current_loop is self._loop:
+            self._enqueue(job)
+        else:
+            # 来自线程池（例如同步的Graph节点）的提交
+            self._loop.call_soon_threadsafe(self._enqueue, job)
+
+    async def flush(self, timeout: float = 10.0) -> None:
+        """等待队列中的任务全部完成并停止worker（在应用关闭时调用）"""
+        if not self.running:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            logger.info("✅ Background queue flushed")
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️  Background queue flush timed out, {self._queue.qsize()} jobs dropped")
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取队列统计信息"""
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def _enqueue(self, job: BackgroundJob) -> None:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"⚠️  Background queue full, dropped job: {job.name}")
+
+    def _execute_inline(self, job: BackgroundJob) -> None:
+        try:
+            job.func(*job.args, **job.kwargs)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Background job failed: {job.name}: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: BackgroundJob) -> None:
+        attempt = 0
+        while True:
+            try:
+                await asyncio.to_thread(job.func, *job.args, **job.kwargs)
+                self.processed += 1
+                return
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    self.failed += 1
+                    logger.error(f"❌ Background job failed after {attempt + 1} attempts: {job.name}: {e}")
+                    return
+
+                delay = self.retry_base_delay * (2 ** attempt)
+                attempt += 1
+                self.retried += 1
+                logger.warning(f"⚠️  Background job failed, retry {attempt}/{self.max_retries} in {delay:.1f}s: {job.name}: {e}")
+                await asyncio.sleep(delay)
+
+
+# 单例实例（全局使用）
+background_queue = BackgroundQueue(
+    max_size=settings.BACKGROUND_QUEUE_MAX_SIZE,
+    max_retries=settings.BACKGROUND_MAX_RETRIES,
+    retry_base_delay=settings.BACKGROUND_RETRY_BASE_DELAY
+)
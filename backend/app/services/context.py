@@ -0,0 +1,216 @@
+"""
+Context Service - 对话历史组装
+
+沿消息树的当前分支（每个用户消息取 sibling_index 最大的助手回复）
+从最新一轮向前打包历史，直到达到模型的 token 预算，
+保证无论会话多长，发送给LLM的提示词大小都有上界。
+"""
+import logging
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional
+
+import tiktoken
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session as DBSession
+
+from app.core.config import settings
+from app.db.database import use_db
+from app.db.models import Message
+
+logger = logging.getLogger(__name__)
+
+# 每条消息在ChatML格式中的额外开销（角色、分隔符）
+MESSAGE_TOKEN_OVERHEAD = 4
+
+_encoding_warned = False
+
+
+@lru_cache(maxsize=32)
+def _get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """
+    获取模型对应的tokenizer（未知模型使用cl100k_base）
+
+    tiktoken首次使用需要下载词表，加载失败（例如没有外网）时返回None，改用估算
+    """
+    global _encoding_warned
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        if not _encoding_warned:
+            _encoding_warned = True
+            logger.warning(f"⚠️  Failed to load tiktoken encoding, falling back to approximate token counts: {e}")
+        return None
+
+
+def _approximate_tokens(text: str) -> int:
+    """粗略估算token数（偏保守）：ASCII约4个字符一个token，其他字符（如中文）约1.5个token"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) * 1.5)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """计算文本的token数"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return _approximate_tokens(text or "")
+    return len(encoding.encode(text or ""))
+
+
+def count_message_tokens(message: BaseMessage, model: str) -> int:
+    """计算单条消息的token数（含格式开销）"""
+    return count_tokens(str(message.content), model) + MESSAGE_TOKEN_OVERHEAD
+
+
+def get_token_budget(model: str) -> int:
+    """获取模型的历史上下文token预算"""
+    return settings.CONTEXT_TOKEN_BUDGETS.get(model, settings.CONTEXT_TOKEN_BUDGET)
+
+
+@dataclass
+class Turn:
+    """当前分支上的一轮对话"""
+    user_message_id: int
+    user_content: str
+    reply_content: Optional[str]
+
+    def to_messages(self) -> List[BaseMessage]:
+        messages: List[BaseMessage] = [HumanMessage(content=self.user_content)]
+        if self.reply_content is not None:
+            messages.append(AIMessage(content=self.reply_content))
+        return messages
+
+    def token_count(self, model: str) -> int:
+        cost = count_tokens(self.user_content, model) + MESSAGE_TOKEN_OVERHEAD
+        if self.reply_content is not None:
+            cost += count_tokens(self.reply_content, model) + MESSAGE_TOKEN_OVERHEAD
+        return cost
+
+
+class ContextService:
+    """对话上下文组装服务"""
+
+    @staticmethod
+    def _iter_turns_newest_first(
+        db: DBSession,
+        session_id: str,
+        after_message_id: Optional[int] = None,
+        before_message_id: Optional[int] = None
+    ) -> Iterator[Turn]:
+        """
+        从最新一轮向前遍历当前分支
+
+        Args:
+            after_message_id: 只包含该用户消息之后的轮次（已并入摘要的轮次不再返回）
+            before_message_id: 只包含该用户消息之前的轮次（重新生成旧消息时使用）
+        """
+        query = db.query(Message).filter(Message.session_id == session_id)
+        # 用户消息按ID过滤，回复按其父消息过滤（含之后重新生成的版本）
+        if after_message_id is not None:
+            query = query.filter(or_(
+                and_(Message.role == 'user', Message.message_id > after_message_id),
+                and_(Message.role == 'assistant', or_(
+                    Message.parent_id > after_message_id,
+                    and_(Message.parent_id.is_(None), Message.message_id > after_message_id)
+                ))
+            ))
+        if before_message_id is not None:
+            query = query.filter(or_(
+                and_(Message.role == 'user', Message.message_id < before_message_id),
+                and_(Message.role == 'assistant', or_(
+                    Message.parent_id < before_message_id,
+                    and_(Message.parent_id.is_(None), Message.message_id < before_message_id)
+                ))
+            ))
+
+        # 从最新消息向前遍历：助手消息总是先于其父用户消息出现
+        best_reply: Dict[int, Message] = {}
+        orphan_reply: Optional[Message] = None  # 树形迁移之前的旧数据没有parent_id
+
+        for m in query.order_by(Message.created_at.desc(), Message.message_id.desc()).yield_per(100):
+            if m.role == 'assistant':
+                if m.parent_id is None:
+                    orphan_reply = orphan_reply or m
+                    continue
+                current = best_reply.get(m.parent_id)
+                if current is None or (m.sibling_index or 0) > (current.sibling_index or 0):
+                    best_reply[m.parent_id] = m
+                continue
+
+            if m.role != 'user' or m.parent_id is not None:
+                continue
+
+            reply = best_reply.pop(m.message_id, None) or orphan_reply
+            orphan_reply = None
+
+            yield Turn(
+                user_message_id=m.message_id,
+                user_content=m.content,
+                reply_content=reply.content if reply is not None else None
+            )
+
+    @staticmethod
+    def get_turns(
+        session_id: str,
+        after_message_id: Optional[int] = None,
+        db: Optional[DBSession] = None
+    ) -> List[Turn]:
+        """获取当前分支上的所有轮次（按时间顺序）"""
+        with use_db(db) as db:
+            turns = list(ContextService._iter_turns_newest_first(
+                db, session_id, after_message_id=after_message_id
+            ))
+        turns.reverse()
+        return turns
+
+    @staticmethod
+    def build_history(
+        session_id: str,
+        model: str,
+        budget: Optional[int] = None,
+        after_message_id: Optional[int] = None,
+        before_message_id: Optional[int] = None,
+        db: Optional[DBSession] = None
+    ) -> List[BaseMessage]:
+        """
+        组装当前分支的对话历史（不含本轮用户消息）
+
+        Args:
+            session_id: 会话ID
+            model: 模型名称（决定tokenizer和默认预算）
+            budget: token预算，为None时使用模型的配置值
+            after_message_id: 只包含该用户消息之后的轮次
+            before_message_id: 只包含该用户消息之前的轮次
+
+        Returns:
+            按时间顺序排列的历史消息，总token数不超过预算
+        """
+        budget = get_token_budget(model) if budget is None else budget
+        if budget <= 0:
+            return []
+
+        turns: List[Turn] = []
+        used = 0
+
+        with use_db(db) as db:
+            for turn in ContextService._iter_turns_newest_first(
+                db, session_id,
+                after_message_id=after_message_id,
+                before_message_id=before_message_id
+            ):
+                # 按完整轮次打包，放不下就停止（保持最近的连续历史）
+                cost = turn.token_count(model)
+                if used + cost > budget:
+                    break
+                used += cost
+                turns.append(turn)
+
+        history: List[BaseMessage] = []
+        for turn in reversed(turns):
+            history.extend(turn.to_messages())
+        return history
@@ -0,0 +1,172 @@
+"""
+Idempotency Store - POST /chat 的幂等键
+
+客户端在 Idempotency-Key 请求头中携带同一个键重试时：
+- 原请求仍在运行：重试挂到同一个运行中的任务上，等待同一个结果
+- 原请求已完成：在TTL内直接重放保存的响应
+- 键相同但请求内容不同：409
+
+运行中的任务由所有等待者共享；某个客户端断开只是退出等待，
+所有等待者都断开后才取消任务（与断开取消机制配合）。
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+
+from app.core.cancellation import ClientDisconnected, run_until_disconnected
+from app.core.config import settings
+from app.core.exceptions import ConflictError
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def request_fingerprint(**fields: Any) -> str:
+    """请求内容指纹（用于检测同一个键被用于不同的请求）"""
+    raw = json.dumps(fields, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _IdempotentEntry:
+    fingerprint: str
+    task: Optional[asyncio.Task] = None
+    response: Optional[Dict[str, Any]] = None
+    expires_at: float = 0.0
+    waiters: int = 0
+
+
+class IdempotencyStore:
+    """幂等键存储（进程内，运行中的任务 + 已完成响应的TTL缓存）"""
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _IdempotentEntry]" = OrderedDict()
+
+        # 统计信息
+        self.executed = 0
+        self.attached = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self.abandoned = 0
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        factory: Callable[[], Awaitable[Dict[str, Any]]],
+        request: Optional[Request] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        按幂等键执行（或复用）一次请求
+
+        Args:
+            key: 幂等键（调用方负责按用户隔离）
+            fingerprint: 请求内容指纹
+            factory: 创建实际执行协程的函数，只在首次请求时调用
+            request: 用于检测客户端断开
+
+        Returns:
+            (响应, 是否为重放的已完成响应)
+
+        Raises:
+            ConflictError: 同一个键对应了不同的请求内容
+            ClientDisconnected: 当前客户端断开（其他等待者不受影响）
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.response is not None and entry.expires_at <= time.time():
+            # 过期的响应按新请求处理
+            del self._entries[key]
+            entry = None
+
+        if entry is not None and entry.fingerprint != fingerprint:
+            self.conflicts += 1
+            raise ConflictError("Idempotency-Key已用于不同的请求内容")
+
+        if entry is not None and entry.response is not None:
+            self.replayed += 1
+            self._entries.move_to_end(key)
+            logger.info(f"幂等键重放已完成的响应: key={key}")
+            return entry.response, True
+
+        if entry is None:
+            entry = _IdempotentEntry(fingerprint=fingerprint)
+            entry.task = asyncio.create_task(self._execute(key, entry, factory))
+            self._entries[key] = entry
+            self._evict()
+            self.executed += 1
+        else:
+            self.attached += 1
+            logger.info(f"幂等键挂到运行中的请求: key={key}")
+
+        entry.waiters += 1
+        try:
+            # shield：当前等待者退出不会直接取消共享任务
+            if request is not None:
+                response = await run_until_disconnected(request, asyncio.shield(entry.task))
+            else:
+                response = await asyncio.shield(entry.task)
+        except (ClientDisconnected, asyncio.CancelledError):
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.task.done():
+                # 没有客户端在等待结果了，取消任务
+                self.abandoned += 1
+                entry.task.cancel()
+            raise
+        entry.waiters -= 1
+        return response, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        in_flight = sum(1 for e in self._entries.values() if e.response is None)
+        return {
+            "entries": len(self._entries),
+            "in_flight": in_flight,
+            "executed": self.executed,
+            "attached": self.attached,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "abandoned": self.abandoned,
+        }
+
+    async def _execute(
+        self,
+        key: str,
+        entry: _IdempotentEntry,
+        factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        try:
+            response = await factory()
+        except BaseException:
+            # 失败或取消的请求不保存，重试时重新执行
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            raise
+
+        entry.response = response
+        entry.expires_at = time.time() + self.ttl_seconds
+        return response
+
+    def _evict(self) -> None:
+        """超过容量时淘汰最早的已完成条目（运行中的条目保留）"""
+        if len(self._entries) <= self.max_entries:
+            return
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if self._entries[key].response is not None:
+                del self._entries[key]
+
+
+# 单例实例（全局使用）
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES
+)
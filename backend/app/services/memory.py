@@ -0,0 +1,227 @@
+"""
+Memory Service - 会话滚动摘要
+
+每累积 K 轮未摘要的对话，就把最早的轮次折叠进会话摘要（session_memory 表），
+Agent 收到的上下文 = 摘要 + 最近几轮原文，而不是完整对话记录。
+摘要更新在响应返回后异步进行，不计入用户可见延迟。
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_openai import ChatOpenAI
+from sqlalchemy.orm import Session as DBSession
+
+from app.core.config import settings
+from app.db.database import use_db
+from app.db.models import SessionMemory
+from app.services.context import ContextService, Turn, count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "你负责维护一段对话的滚动摘要。请将新的对话内容并入已有摘要：\n"
+    "- 保留用户的目标、偏好、约束和关键事实\n"
+    "- 保留已经得出的结论、给出的代码/方案要点和尚未解决的问题\n"
+    "- 删去寒暄和重复内容\n\n"
+    "只输出更新后的摘要，不超过{max_words}字。"
+)
+
+
+class MemoryService:
+    """会话记忆服务"""
+
+    _llm: Optional[ChatOpenAI] = None
+    _updating: Set[str] = set()  # 正在更新摘要的会话
+    _tasks: Set[asyncio.Task] = set()  # 持有后台任务引用，避免被回收
+
+    @staticmethod
+    def get_memory(session_id: str, db: Optional[DBSession] = None) -> Optional[Dict]:
+        """获取会话记忆"""
+        with use_db(db) as db:
+            memory = db.query(SessionMemory).filter(
+                SessionMemory.session_id == session_id
+            ).first()
+
+            if not memory:
+                return None
+
+            return {
+                'session_id': memory.session_id,
+                'summary': memory.summary or "",
+                'summarized_until': memory.summarized_until,
+                'summarized_turns': memory.summarized_turns or 0,
+            }
+
+    @staticmethod
+    def build_context(
+        session_id: str,
+        model: str,
+        budget: int,
+        before_message_id: Optional[int] = None,
+        db: Optional[DBSession] = None
+    ) -> List[BaseMessage]:
+        """
+        组装Agent的对话上下文：摘要 + 摘要之后的最近轮次（共享同一token预算）
+
+        重新生成已并入摘要的旧消息时，摘要中包含该消息之后的内容，
+        摘要本身超出预算时也无法保证上界，这两种情况退回普通的历史组装
+        """
+        memory = MemoryService.get_memory(session_id, db=db) if settings.MEMORY_SUMMARY_ENABLED else None
+
+        if (
+            memory is None
+            or not memory['summary']
+            or (before_message_id is not None and before_message_id <= memory['summarized_until'])
+        ):
+            return ContextService.build_history(
+                session_id, model=model, budget=budget,
+                before_message_id=before_message_id, db=db
+            )
+
+        summary_message = SystemMessage(content=f"以下是本会话较早内容的摘要：\n{memory['summary']}")
+        summary_tokens = count_message_tokens(summary_message, model)
+        if summary_tokens > budget:
+            logger.warning(f"⚠️  Summary for {session_id} ({summary_tokens} tokens) exceeds budget {budget}, using plain history")
+            return ContextService.build_history(
+                session_id, model=model, budget=budget,
+                before_message_id=before_message_id, db=db
+            )
+
+        recent = ContextService.build_history(
+            session_id,
+            model=model,
+            budget=budget - summary_tokens,
+            after_message_id=memory['summarized_until'],
+            before_message_id=before_message_id,
+            db=db
+        )
+        return [summary_message, *recent]
+
+    @staticmethod
+    def schedule_update(session_id: str, message_count: int = 0) -> None:
+        """
+        在后台检查并更新会话摘要（同一会话同时只有一个更新任务）
+
+        Args:
+            message_count: 本轮之前的消息数，用于跳过明显不需要摘要的短会话
+        """
+        if not settings.MEMORY_SUMMARY_ENABLED or session_id in MemoryService._updating:
+            return
+
+        threshold = settings.MEMORY_SUMMARY_EVERY_TURNS + settings.MEMORY_RECENT_TURNS
+        if message_count // 2 + 1 < threshold:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        MemoryService._updating.add(session_id)
+        task = loop.create_task(MemoryService.update_summary(session_id))
+        MemoryService._tasks.add(task)
+
+        def _done(t: asyncio.Task) -> None:
+            MemoryService._tasks.discard(t)
+            MemoryService._updating.discard(session_id)
+
+        task.add_done_callback(_done)
+
+    @staticmethod
+    async def flush(timeout: float = 30.0) -> None:
+        """等待正在运行的摘要更新完成（应用关闭时调用，超时后剩余任务随事件循环取消）"""
+        if not MemoryService._tasks:
+            return
+        _, pending = await asyncio.wait(set(MemoryService._tasks), timeout=timeout)
+        if pending:
+            logger.warning(f"⚠️  Memory summary flush timed out, {len(pending)} updates unfinished")
+        else:
+            logger.info("✅ Memory summary updates finished")
+
+    @staticmethod
+    async def update_summary(session_id: str) -> int:
+        """
+        把超出最近窗口的旧轮次折叠进摘要
+
+        每次LLM调用最多折叠K轮，旧的长会话首次摘要时分多次完成
+
+        Returns:
+            本次折叠的轮次数
+        """
+        every = max(settings.MEMORY_SUMMARY_EVERY_TURNS, 1)
+        keep = settings.MEMORY_RECENT_TURNS
+        folded = 0
+
+        try:
+            memory = await asyncio.to_thread(MemoryService.get_memory, session_id)
+            summary = memory['summary'] if memory else ""
+            after = memory['summarized_until'] if memory else None
+
+            turns = await asyncio.to_thread(ContextService.get_turns, session_id, after)
+
+            while len(turns) - keep >= every:
+                chunk, turns = turns[:every], turns[every:]
+                summary = await MemoryService._summarize(summary, chunk)
+                await asyncio.to_thread(
+                    MemoryService._save_summary,
+                    session_id, summary, chunk[-1].user_message_id, len(chunk)
+                )
+                folded += len(chunk)
+
+            if folded:
+                logger.info(f"🧠 Folded {folded} turns into summary for {session_id}")
+        except Exception as e:
+            logger.error(f"❌ Failed to update summary for {session_id}: {e}")
+
+        return folded
+
+    @staticmethod
+    def _get_llm() -> ChatOpenAI:
+        if MemoryService._llm is None:
+            llm_kwargs = {
+                "model": settings.MEMORY_SUMMARY_MODEL or settings.OPENAI_MODEL,
+                "temperature": 0,
+                "api_key": settings.OPENAI_API_KEY,
+                "timeout": settings.OPENAI_TIMEOUT,
+                "max_retries": settings.OPENAI_MAX_RETRIES,
+            }
+            if settings.OPENAI_BASE_URL:
+                llm_kwargs["base_url"] = settings.OPENAI_BASE_URL
+            MemoryService._llm = ChatOpenAI(**llm_kwargs)
+        return MemoryService._llm
+
+    @staticmethod
+    async def _summarize(summary: str, turns: List[Turn]) -> str:
+        """调用LLM把新的轮次并入已有摘要"""
+        transcript = "\n\n".join(
+            f"用户: {t.user_content}\n助手: {t.reply_content or ''}" for t in turns
+        )
+        response = await MemoryService._get_llm().ainvoke([
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT.format(max_words=settings.MEMORY_SUMMARY_MAX_WORDS)),
+            HumanMessage(content=f"已有摘要:\n{summary or '（无）'}\n\n新的对话:\n{transcript}"),
+        ])
+        return str(response.content).strip()
+
+    @staticmethod
+    def _save_summary(
+        session_id: str,
+        summary: str,
+        summarized_until: int,
+        turns: int,
+        db: Optional[DBSession] = None
+    ) -> None:
+        """保存摘要及其覆盖范围"""
+        with use_db(db) as db:
+            memory = db.query(SessionMemory).filter(
+                SessionMemory.session_id == session_id
+            ).first()
+
+            if not memory:
+                memory = SessionMemory(session_id=session_id, summarized_turns=0)
+                db.add(memory)
+
+            memory.summary = summary
+            memory.summarized_until = summarized_until
+            memory.summarized_turns = (memory.summarized_turns or 0) + turns
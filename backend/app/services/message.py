@@ -3,7 +3,8 @@ Message Service - 消息管理服务（SQLAlchemy ORM版本）
 支持树形结构：父节点、子节点、兄弟节点
 """
 from typing import List, Optional, Dict
-from app.db.database import get_db
+from sqlalchemy.orm import Session as DBSession
+from app.db.database import use_db
 from app.db.models import Message
 from sqlalchemy import desc, func
 
@@ -19,7 +20,8 @@ class MessageService:
         agent_type: Optional[str] = None,
         model: str = "gpt-4o",
         parent_id: Optional[int] = None,
-        sibling_index: Optional[int] = None
+        sibling_index: Optional[int] = None,
+        db: Optional[DBSession] = None
     ) -> int:
         """
         创建新消息
@@ -36,7 +38,7 @@ class MessageService:
         Returns:
             消息ID
         """
-        with get_db() as db:
+        with use_db(db) as db:
             # 如果是助手消息且有parent_id，需要计算sibling_index
             if role == 'assistant' and parent_id is not None and sibling_index is None:
                 # 查找同一父节点下已有的子节点数量
@@ -61,7 +63,7 @@ class MessageService:
         return message_id
     
     @staticmethod
-    def find_user_message_by_content(session_id: str, content: str) -> Optional[int]:
+    def find_user_message_by_content(session_id: str, content: str, db: Optional[DBSession] = None) -> Optional[int]:
         """
         查找相同内容的用户消息（用于版本分组）
         
@@ -72,7 +74,7 @@ class MessageService:
         Returns:
             用户消息ID，如果不存在则返回None
         """
-        with get_db() as db:
+        with use_db(db) as db:
             # 查找最后一个用户消息，且parent_id为NULL（根节点）
             message = db.query(Message).filter(
                 Message.session_id == session_id,
@@ -84,12 +86,32 @@ class MessageService:
             return message.message_id if message else None
     
     @staticmethod
-    def get_session_messages(session_id: str) -> List[Dict]:
+    def get_latest_agent_type(parent_id: int, db: Optional[DBSession] = None) -> Optional[str]:
+        """
+        获取用户消息最新一个回答的Agent类型（重新生成时复用路由决策）
+        
+        Args:
+            parent_id: 用户消息ID
+        
+        Returns:
+            Agent类型，如果还没有回答则返回None
+        """
+        with use_db(db) as db:
+            message = db.query(Message).filter(
+                Message.parent_id == parent_id,
+                Message.role == 'assistant',
+                Message.agent_type.isnot(None)
+            ).order_by(Message.created_at.desc()).first()
+            
+            return message.agent_type if message else None
+    
+    @staticmethod
+    def get_session_messages(session_id: str, db: Optional[DBSession] = None) -> List[Dict]:
         """
         获取会话的所有消息（树形结构）
         返回扁平化的消息列表，包含树形关系信息
         """
-        with get_db() as db:
+        with use_db(db) as db:
             messages = db.query(Message).filter(
                 Message.session_id == session_id
             ).order_by(Message.created_at).all()
@@ -111,7 +133,7 @@ class MessageService:
             ]
     
     @staticmethod
-    def get_message_children(parent_id: int) -> List[Dict]:
+    def get_message_children(parent_id: int, db: Optional[DBSession] = None) -> List[Dict]:
         """
         获取指定消息的所有子节点（兄弟节点）
         
@@ -121,7 +143,7 @@ class MessageService:
         Returns:
             子消息列表，按sibling_index排序
         """
-        with get_db() as db:
+        with use_db(db) as db:
             messages = db.query(Message).filter(
                 Message.parent_id == parent_id
             ).order_by(Message.sibling_index).all()
@@ -143,18 +165,18 @@ class MessageService:
             ]
     
     @staticmethod
-    def get_message_count(session_id: str) -> int:
+    def get_message_count(session_id: str, db: Optional[DBSession] = None) -> int:
         """获取会话的消息数量"""
-        with get_db() as db:
+        with use_db(db) as db:
             count = db.query(Message).filter(
                 Message.session_id == session_id
             ).count()
             return count
     
     @staticmethod
-    def update_message(message_id: int, content: str) -> bool:
+    def update_message(message_id: int, content: str, db: Optional[DBSession] = None) -> bool:
         """更新消息内容"""
-        with get_db() as db:
+        with use_db(db) as db:
             message = db.query(Message).filter(
                 Message.message_id == message_id
             ).first()
@@ -166,9 +188,9 @@ class MessageService:
             return True
     
     @staticmethod
-    def delete_message(message_id: int) -> bool:
+    def delete_message(message_id: int, db: Optional[DBSession] = None) -> bool:
         """删除单条消息"""
-        with get_db() as db:
+        with use_db(db) as db:
             message = db.query(Message).filter(
                 Message.message_id == message_id
             ).first()
@@ -180,9 +202,9 @@ class MessageService:
             return True
     
     @staticmethod
-    def delete_messages_after(message_id: int) -> bool:
+    def delete_messages_after(message_id: int, db: Optional[DBSession] = None) -> bool:
         """删除指定消息之后的所有消息"""
-        with get_db() as db:
+        with use_db(db) as db:
             # Get the message to find its timestamp and session
             target_message = db.query(Message).filter(
                 Message.message_id == message_id
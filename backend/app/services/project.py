@@ -3,7 +3,8 @@ Project Service - 项目管理服务（SQLAlchemy ORM版本）
 """
 from typing import List, Optional, Dict
 import uuid
-from app.db.database import get_db
+from sqlalchemy.orm import Session as DBSession
+from app.db.database import use_db
 from app.db.models import Project
 from sqlalchemy import desc
 
@@ -16,12 +17,13 @@ class ProjectService:
         name: str,
         description: Optional[str] = None,
         color: str = "blue",
-        icon: str = "📁"
+        icon: str = "📁",
+        db: Optional[DBSession] = None
     ) -> str:
         """创建新项目"""
         project_id = f"project_{uuid.uuid4().hex[:16]}"
         
-        with get_db() as db:
+        with use_db(db) as db:
             project = Project(
                 project_id=project_id,
                 name=name,
@@ -34,9 +36,9 @@ class ProjectService:
         return project_id
     
     @staticmethod
-    def get_all_projects() -> List[Dict]:
+    def get_all_projects(db: Optional[DBSession] = None) -> List[Dict]:
         """获取所有项目"""
-        with get_db() as db:
+        with use_db(db) as db:
             projects = db.query(Project).order_by(
                 desc(Project.created_at)
             ).all()
@@ -55,9 +57,9 @@ class ProjectService:
             ]
     
     @staticmethod
-    def get_project(project_id: str) -> Optional[Dict]:
+    def get_project(project_id: str, db: Optional[DBSession] = None) -> Optional[Dict]:
         """获取单个项目"""
-        with get_db() as db:
+        with use_db(db) as db:
             project = db.query(Project).filter(
                 Project.project_id == project_id
             ).first()
@@ -80,10 +82,11 @@ class ProjectService:
         name: Optional[str] = None,
         description: Optional[str] = None,
         color: Optional[str] = None,
-        icon: Optional[str] = None
+        icon: Optional[str] = None,
+        db: Optional[DBSession] = None
     ) -> bool:
         """更新项目信息"""
-        with get_db() as db:
+        with use_db(db) as db:
             project = db.query(Project).filter(
                 Project.project_id == project_id
             ).first()
@@ -103,9 +106,9 @@ class ProjectService:
             return True
     
     @staticmethod
-    def delete_project(project_id: str) -> bool:
+    def delete_project(project_id: str, db: Optional[DBSession] = None) -> bool:
         """删除项目"""
-        with get_db() as db:
+        with use_db(db) as db:
             project = db.query(Project).filter(
                 Project.project_id == project_id
             ).first()
@@ -0,0 +1,158 @@
+"""
+Route Decision Logger - 路由决策的批量写入
+
+Router在热路径上只把决策放入有界的内存队列（不连接数据库、不等待fsync），
+后台线程把队列中的决策攒成批，用 executemany 在一个事务中写入 route_history。
+
+- 使用线程而不是 asyncio 任务：Router的同步调用路径和脚本中没有事件循环也能记录
+- 队列已满时丢弃新的决策并计数（监控数据，不能反压聊天请求）
+- 应用关闭时写完队列中剩余的决策（见 app.core.events.shutdown_event）
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_INSERT_SQL = """
+    INSERT INTO route_history (session_id, user_message, routed_to, reasoning, timestamp, decided_by)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class RouteDecisionLogger:
+    """路由决策批量写入器"""
+
+    def __init__(self, max_queue: int = 10000, max_batch: int = 200, flush_interval: float = 1.0):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+
+        self._queue: "queue.Queue[Tuple]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._conn: Optional[sqlite3.Connection] = None  # 只在写入线程中使用
+
+        # 统计信息
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """启动写入线程（首次记录时也会自动启动）"""
+        with self._start_lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="route-decision-logger", daemon=True)
+            self._thread.start()
+
+    def log(
+        self,
+        session_id: str,
+        user_message: str,
+        routed_to: str,
+        reasoning: str,
+        decided_by: str = "llm"
+    ) -> None:
+        """记录一条路由决策（不阻塞）"""
+        if not self.running:
+            self.start()
+        row = (session_id, user_message, routed_to, reasoning, datetime.now().isoformat(), decided_by)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"⚠️  Route decision queue full, {self.dropped} decisions dropped so far")
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """写完队列中剩余的决策并停止写入线程"""
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            logger.warning(f"⚠️  Route decision logger flush timed out, {self._queue.qsize()} decisions pending")
+        else:
+            logger.info("✅ Route decision logger flushed")
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "running": self.running,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _run(self) -> None:
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+                elif self._stopping.is_set():
+                    return
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _next_batch(self) -> List[Tuple]:
+        """等待第一条决策，再在flush_interval内继续收集，直到攒满一批"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            # 关闭时不再等待，直接写入已有的部分
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Tuple]) -> None:
+        """在一个事务中写入一批决策"""
+        try:
+            if self._conn is None:
+                from app.api.v1.endpoints.router_monitor import DB_PATH
+                self._conn = sqlite3.connect(DB_PATH)
+            with self._conn:
+                self._conn.executemany(_INSERT_SQL, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"❌ Failed to write {len(batch)} route decisions: {e}")
+            # 下一批重新连接
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 单例实例（全局使用）
+route_decision_logger = RouteDecisionLogger(
+    max_queue=settings.ROUTE_LOG_QUEUE_SIZE,
+    max_batch=settings.ROUTE_LOG_MAX_BATCH,
+    flush_interval=settings.ROUTE_LOG_FLUSH_INTERVAL
+)
@@ -0,0 +1,235 @@
+"""
+Semantic Cache - 近似问题的回答缓存
+
+在Graph之前，用 VectorStoreService 的 embedding 模型向量化用户消息，
+在独立的 Chroma 集合中查找相似度超过阈值的历史回答；命中时直接返回，
+跳过 Router 和 Agent 的 LLM 调用。
+
+- 条目按模型隔离，记录处理它的路由（researcher 等时效性路由使用更短的TTL）
+- 只缓存没有对话历史的首轮问题（有上下文的回答不能复用）
+- chromadb 为可选依赖，未安装时自动禁用
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SemanticLookup:
+    """一次语义缓存查询的结果（未命中时保留向量，写入时复用）"""
+    embedding: List[float]
+    answer: Optional[str] = None
+    route: Optional[str] = None
+    similarity: float = 0.0
+
+    @property
+    def hit(self) -> bool:
+        return self.answer is not None
+
+
+class SemanticCache:
+    """语义缓存（Chroma 集合，余弦相似度）"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        threshold: float = 0.92,
+        ttl_seconds: float = 86400,
+        route_ttls: Optional[Dict[str, float]] = None,
+        persist_directory: str = "./data/semantic_cache",
+        collection_name: str = "semantic_cache"
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.route_ttls = route_ttls or {}
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+
+        self._collection = None
+        self._embeddings = None
+        self._init_lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    def ttl_for(self, route: str) -> float:
+        """路由对应的TTL（秒），0表示该路由不缓存"""
+        return self.route_ttls.get(route, self.ttl_seconds)
+
+    async def lookup(self, message: str, model: str) -> Optional[SemanticLookup]:
+        """
+        查找相似问题的缓存回答
+
+        Returns:
+            查询结果；缓存不可用时返回None
+        """
+        if not self.enabled:
+            return None
+        try:
+            return await asyncio.to_thread(self._lookup, message, model)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️  Semantic cache lookup failed: {e}")
+            return None
+
+    def store(self, lookup: Optional[SemanticLookup], message: str, model: str, route: str, answer: str) -> None:
+        """写入缓存（交给后台队列，复用查询时计算的向量）"""
+        if lookup is None or lookup.hit or not answer or self.ttl_for(route) <= 0:
+            return
+        from app.services.background import background_queue
+        background_queue.submit(self._store, lookup.embedding, message, model, route, answer)
+
+    def invalidate(self, route: Optional[str] = None, model: Optional[str] = None) -> int:
+        """
+        删除缓存条目
+
+        Args:
+            route: 只删除该路由的条目
+            model: 只删除该模型的条目
+
+        Returns:
+            删除的条目数
+        """
+        collection = self._get_collection()
+        if collection is None:
+            return 0
+
+        conditions = []
+        if route:
+            conditions.append({"route": route})
+        if model:
+            conditions.append({"model": model})
+        return self._delete_where(collection, conditions)
+
+    def purge_expired(self) -> int:
+        """删除所有过期条目"""
+        collection = self._get_collection()
+        if collection is None:
+            return 0
+        return self._delete_where(collection, [{"expires_at": {"$lte": time.time()}}])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "size": self._collection.count() if self._collection is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "errors": self.errors,
+        }
+
+    def _get_collection(self):
+        """延迟初始化集合和embedding模型（chromadb未安装时禁用缓存）"""
+        if self._collection is not None or not self.enabled:
+            return self._collection
+
+        with self._init_lock:
+            if self._collection is None:
+                try:
+                    import chromadb
+                except ImportError:
+                    logger.warning("⚠️  chromadb is not installed, semantic cache disabled")
+                    self.enabled = False
+                    return None
+
+                from app.services.vector_store import vector_store_service
+
+                client = chromadb.PersistentClient(path=self.persist_directory)
+                self._embeddings = vector_store_service.embeddings
+                self._collection = client.get_or_create_collection(
+                    name=self.collection_name,
+                    metadata={"hnsw:space": "cosine"}
+                )
+                logger.info(f"✅ Semantic cache initialized ({self._collection.count()} entries)")
+        return self._collection
+
+    def _lookup(self, message: str, model: str) -> Optional[SemanticLookup]:
+        collection = self._get_collection()
+        if collection is None:
+            return None
+
+        embedding = self._embeddings.embed_query(message)
+        result = collection.query(
+            query_embeddings=[embedding],
+            n_results=1,
+            where={"$and": [{"model": model}, {"expires_at": {"$gt": time.time()}}]},
+            include=["metadatas", "distances"]
+        )
+
+        lookup = SemanticLookup(embedding=embedding)
+        if result["ids"] and result["ids"][0]:
+            # 余弦距离 -> 相似度
+            similarity = 1 - result["distances"][0][0]
+            if similarity >= self.threshold:
+                metadata = result["metadatas"][0][0]
+                lookup.answer = metadata["answer"]
+                lookup.route = metadata["route"]
+                lookup.similarity = similarity
+
+        if lookup.hit:
+            self.hits += 1
+            logger.info(f"🎯 Semantic cache hit: route={lookup.route}, similarity={lookup.similarity:.3f}")
+        else:
+            self.misses += 1
+        return lookup
+
+    def _store(self, embedding: List[float], message: str, model: str, route: str, answer: str) -> None:
+        collection = self._get_collection()
+        if collection is None:
+            return
+
+        now = time.time()
+        collection.add(
+            ids=[uuid.uuid4().hex],
+            embeddings=[embedding],
+            documents=[message],
+            metadatas=[{
+                "model": model,
+                "route": route,
+                "answer": answer,
+                "created_at": now,
+                "expires_at": now + self.ttl_for(route),
+            }]
+        )
+        self.stores += 1
+
+    @staticmethod
+    def _delete_where(collection, conditions: List[Dict[str, Any]]) -> int:
+        if not conditions:
+            where = None
+        elif len(conditions) == 1:
+            where = conditions[0]
+        else:
+            where = {"$and": conditions}
+
+        ids = collection.get(where=where, include=[])["ids"]
+        if ids:
+            collection.delete(ids=ids)
+            logger.info(f"🗑️  Removed {len(ids)} semantic cache entries")
+        return len(ids)
+
+
+# 单例实例（全局使用）
+semantic_cache = SemanticCache(
+    enabled=settings.SEMANTIC_CACHE_ENABLED,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    route_ttls=settings.SEMANTIC_CACHE_ROUTE_TTLS,
+    persist_directory=settings.SEMANTIC_CACHE_DIR
+)
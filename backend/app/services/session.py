@@ -5,7 +5,8 @@ from typing import List, Optional, Dict
 from datetime import datetime
 import uuid
 import json
-from app.db.database import get_db
+from sqlalchemy.orm import Session as DBSession
+from app.db.database import use_db
 from app.db.models import Session, Message
 from sqlalchemy import desc
 
@@ -13,16 +14,23 @@ from sqlalchemy import desc
 class SessionService:
     """会话管理服务"""
     
+    @staticmethod
+    def generate_session_id() -> str:
+        """生成新的会话ID"""
+        return f"session_{uuid.uuid4().hex[:16]}"
+    
     @staticmethod
     def create_session(
         user_id: str = "default_user",
         title: Optional[str] = None,
-        project_id: Optional[str] = None
+        project_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        db: Optional[DBSession] = None
     ) -> str:
-        """创建新会话"""
-        session_id = f"session_{uuid.uuid4().hex[:16]}"
+        """创建新会话（session_id为空时自动生成）"""
+        session_id = session_id or SessionService.generate_session_id()
         
-        with get_db() as db:
+        with use_db(db) as db:
             new_session = Session(
                 session_id=session_id,
                 user_id=user_id,
@@ -30,13 +38,14 @@ class SessionService:
                 project_id=project_id
             )
             db.add(new_session)
+            db.flush()  # 共享工作单元中，后续查询需要能看到新会话
         
         return session_id
     
     @staticmethod
-    def get_all_sessions(user_id: str = "default_user") -> List[Dict]:
+    def get_all_sessions(user_id: str = "default_user", db: Optional[DBSession] = None) -> List[Dict]:
         """获取所有会话"""
-        with get_db() as db:
+        with use_db(db) as db:
             sessions = db.query(Session).filter(
                 Session.user_id == user_id
             ).order_by(desc(Session.updated_at)).all()
@@ -70,9 +79,9 @@ class SessionService:
             return result
     
     @staticmethod
-    def get_session(session_id: str) -> Optional[Dict]:
+    def get_session(session_id: str, db: Optional[DBSession] = None) -> Optional[Dict]:
         """获取单个会话详情"""
-        with get_db() as db:
+        with use_db(db) as db:
             session = db.query(Session).filter(
                 Session.session_id == session_id
             ).first()
@@ -97,10 +106,11 @@ class SessionService:
         title: Optional[str] = None,
         is_starred: Optional[bool] = None,
         project_id: Optional[str] = None,
-        tags: Optional[List[str]] = None
+        tags: Optional[List[str]] = None,
+        db: Optional[DBSession] = None
     ) -> bool:
         """更新会话信息"""
-        with get_db() as db:
+        with use_db(db) as db:
             session = db.query(Session).filter(
                 Session.session_id == session_id
             ).first()
@@ -125,9 +135,9 @@ class SessionService:
             return True
     
     @staticmethod
-    def delete_session(session_id: str) -> bool:
+    def delete_session(session_id: str, db: Optional[DBSession] = None) -> bool:
         """删除会话（级联删除消息）"""
-        with get_db() as db:
+        with use_db(db) as db:
             session = db.query(Session).filter(
                 Session.session_id == session_id
             ).first()
@@ -139,9 +149,9 @@ class SessionService:
             return True
     
     @staticmethod
-    def get_starred_sessions(user_id: str = "default_user") -> List[Dict]:
+    def get_starred_sessions(user_id: str = "default_user", db: Optional[DBSession] = None) -> List[Dict]:
         """获取收藏的会话"""
-        with get_db() as db:
+        with use_db(db) as db:
             sessions = db.query(Session).filter(
                 Session.user_id == user_id,
                 Session.is_starred == True
@@ -159,9 +169,9 @@ class SessionService:
             ]
     
     @staticmethod
-    def get_project_sessions(project_id: str) -> List[Dict]:
+    def get_project_sessions(project_id: str, db: Optional[DBSession] = None) -> List[Dict]:
         """获取项目下的所有会话"""
-        with get_db() as db:
+        with use_db(db) as db:
             sessions = db.query(Session).filter(
                 Session.project_id == project_id
             ).order_by(desc(Session.updated_at)).all()
@@ -177,9 +187,9 @@ class SessionService:
             ]
     
     @staticmethod
-    def update_session_timestamp(session_id: str):
+    def update_session_timestamp(session_id: str, db: Optional[DBSession] = None):
         """更新会话时间戳"""
-        with get_db() as db:
+        with use_db(db) as db:
             session = db.query(Session).filter(
                 Session.session_id == session_id
             ).first()
@@ -188,8 +198,8 @@ class SessionService:
                 session.updated_at = datetime.utcnow()
     
     @staticmethod
-    def auto_generate_title(session_id: str, first_message: str):
-        """自动生成会话标题"""
+    def generate_title(first_message: str) -> str:
+        """根据第一条消息生成会话标题"""
         # 清理消息文本
         title = first_message.strip()
         
@@ -204,5 +214,11 @@ class SessionService:
         if len(title) < 3:
             title = "新对话"
         
-        SessionService.update_session(session_id, title=title)
+        return title
+    
+    @staticmethod
+    def auto_generate_title(session_id: str, first_message: str, db: Optional[DBSession] = None):
+        """自动生成会话标题"""
+        title = SessionService.generate_title(first_message)
+        SessionService.update_session(session_id, title=title, db=db)
         print(f"✅ Auto-generated title for {session_id}: {title}")
@@ -0,0 +1,199 @@
+"""
+Message Write Buffer - 消息写入的组提交（group commit）
+
+并发请求的消息写入先进入缓冲区，worker 每隔几毫秒（或攒满 N 条）
+在同一个事务中批量提交，一次 fsync 完成多条写入；
+调用方通过 Future 拿到自己的 message_id，返回时数据已落盘。
+
+会话时间戳更新会在批次内合并为一条 UPDATE。
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session as DBSession
+
+from app.core.config import settings
+from app.db.database import get_db
+from app.db.models import Session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingWrite:
+    """缓冲区中的一个条目：写入函数或会话时间戳更新"""
+    fn: Optional[Callable[[DBSession], Any]] = None
+    future: Optional[asyncio.Future] = None
+    touch_session_id: Optional[str] = None
+
+
+class MessageWriteBuffer:
+    """消息写入缓冲区（组提交）"""
+
+    def __init__(self, enabled: bool = False, max_batch: int = 100, max_delay_ms: float = 5.0):
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # 统计信息
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.fallbacks = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        """启动worker（仅在启用时）"""
+        if not self.enabled or self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"✅ Message write buffer started (batch<={self.max_batch}, window={self.max_delay * 1000:.0f}ms)"
+        )
+
+    async def flush(self, timeout: float = 10.0) -> None:
+        """提交缓冲区中剩余的写入并停止worker"""
+        if not self.running:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            logger.info("✅ Message write buffer flushed")
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️  Message write buffer flush timed out, {self._queue.qsize()} writes pending")
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def submit(self, fn: Callable[[DBSession], Any]) -> Any:
+        """
+        提交一个写入函数，等待所在批次提交后返回其结果
+
+        Args:
+            fn: 接收数据库会话的写入函数（不要自行提交）
+        """
+        if not self.running:
+            # 未启用时退化为独立事务
+            results = await asyncio.to_thread(self._commit_batch, [fn], set())
+            return results[0]
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_PendingWrite(fn=fn, future=future))
+        return await future
+
+    async def create_message(self, **fields: Any) -> int:
+        """写入一条消息，返回分配的message_id（参数同MessageService.create_message）"""
+        from app.services.message import MessageService
+        return await self.submit(lambda db: MessageService.create_message(db=db, **fields))
+
+    def touch_session(self, session_id: str) -> None:
+        """更新会话时间戳（在下一个批次中合并执行，不等待结果）"""
+        if not self.running:
+            from app.services.background import background_queue
+            from app.services.session import SessionService
+            background_queue.submit(SessionService.update_session_timestamp, session_id)
+            return
+        self._queue.put_nowait(_PendingWrite(touch_session_id=session_id))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓冲区统计信息"""
+        return {
+            "enabled": self.enabled,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+
+            # 收集窗口：等待几毫秒，让并发请求的写入进入同一批次
+            if self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, batch: List[_PendingWrite]) -> None:
+        # 调用方已取消（例如客户端断开）的写入不再执行
+        writes = [p for p in batch if p.fn is not None and not p.future.done()]
+        touched = {p.touch_session_id for p in batch if p.touch_session_id}
+
+        if not writes and not touched:
+            return
+
+        try:
+            results = await asyncio.to_thread(self._commit_batch, [p.fn for p in writes], touched)
+        except Exception as e:
+            # 整批回滚：逐条重试，只让真正失败的调用方收到异常
+            logger.warning(f"⚠️  Batch commit of {len(writes)} writes failed, retrying individually: {e}")
+            self.fallbacks += 1
+            await self._write_individually(writes, touched)
+            return
+
+        for pending, result in zip(writes, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+        self.batches += 1
+        self.rows += len(writes)
+        self.largest_batch = max(self.largest_batch, len(writes))
+
+    async def _write_individually(self, writes: List[_PendingWrite], touched: Set[str]) -> None:
+        for pending in writes:
+            try:
+                results = await asyncio.to_thread(self._commit_batch, [pending.fn], set())
+            except Exception as e:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+                continue
+            if not pending.future.done():
+                pending.future.set_result(results[0])
+
+        if touched:
+            try:
+                await asyncio.to_thread(self._commit_batch, [], touched)
+            except Exception as e:
+                logger.error(f"❌ Failed to update session timestamps: {e}")
+
+    @staticmethod
+    def _commit_batch(fns: List[Callable[[DBSession], Any]], touched: Set[str]) -> List[Any]:
+        """在一个事务中执行所有写入并提交"""
+        with get_db() as db:
+            results = [fn(db) for fn in fns]
+            if touched:
+                db.query(Session).filter(
+                    Session.session_id.in_(touched)
+                ).update({Session.updated_at: datetime.utcnow()}, synchronize_session=False)
+        return results
+
+
+# 单例实例（全局使用）
+message_write_buffer = MessageWriteBuffer(
+    enabled=settings.MESSAGE_WRITE_BEHIND_ENABLED,
+    max_batch=settings.MESSAGE_WRITE_BEHIND_MAX_BATCH,
+    max_delay_ms=settings.MESSAGE_WRITE_BEHIND_MAX_DELAY_MS
+)
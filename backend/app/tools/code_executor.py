@@ -2,12 +2,19 @@
 代码执行工具 - 安全的Python REPL
 """
 from typing import List
+import asyncio
+import sys
+import threading
 from langchain_experimental.utilities import PythonREPL
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 import re
+from app.core.config import settings
 
 # 初始化REPL
 _repl_instance = PythonREPL()
+# 不设置timeout时PythonREPL.run在当前进程中临时替换全局sys.stdout，并发执行时需要串行化；
+# 设置timeout时代码在multiprocessing子进程中执行，不需要加锁，可以并行
+_repl_lock = threading.Lock()
 
 # 危险操作黑名单
 _forbidden_patterns = [
@@ -32,8 +39,7 @@ def _is_safe_code(code: str) -> tuple[bool, str]:
     
     return True, ""
 
-@tool
-def execute_python(code: str) -> str:
+def _execute_python(code: str) -> str:
     """
     执行Python代码并返回结果
     
@@ -53,7 +59,12 @@ def execute_python(code: str) -> str:
         return f"❌ 安全检查失败: {error_msg}"
     
     try:
-        result = _repl_instance.run(code)
+        # 设置timeout时PythonREPL在子进程中执行，超时后终止（<=0表示不限制，在当前进程中执行）
+        if settings.CODE_EXECUTION_TIMEOUT > 0:
+            result = _repl_instance.run(code, timeout=max(int(settings.CODE_EXECUTION_TIMEOUT), 1))
+        else:
+            with _repl_lock:
+                result = _repl_instance.run(code)
         
         # 如果结果为空，说明没有输出
         if not result or result.strip() == "":
@@ -66,6 +77,53 @@ def execute_python(code: str) -> str:
     except Exception as e:
         return f"❌ 运行时错误:\n{type(e).__name__}: {str(e)}"
 
+async def _aexecute_python(code: str) -> str:
+    """
+    execute_python的异步实现：在独立子进程中执行
+
+    请求被取消（例如客户端断开）或超时时直接终止子进程，
+    不会像线程那样在后台继续运行
+    """
+    is_safe, error_msg = _is_safe_code(code)
+    if not is_safe:
+        return f"❌ 安全检查失败: {error_msg}"
+
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-I", "-c", code,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    try:
+        output, _ = await asyncio.wait_for(
+            process.communicate(),
+            timeout=settings.CODE_EXECUTION_TIMEOUT if settings.CODE_EXECUTION_TIMEOUT > 0 else None
+        )
+    except asyncio.TimeoutError:
+        return f"❌ 运行时错误:\n执行超时（超过{settings.CODE_EXECUTION_TIMEOUT}秒）"
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+    result = output.decode("utf-8", errors="replace")
+    if process.returncode != 0:
+        if "SyntaxError" in result:
+            return f"❌ 语法错误:\n{result}"
+        return f"❌ 运行时错误:\n{result}"
+
+    # 如果结果为空，说明没有输出
+    if not result.strip():
+        return "✅ 代码执行成功（无输出）"
+
+    return f"✅ 执行成功:\n{result}"
+
+# 同时提供同步和异步实现：graph.invoke走同步路径，graph.ainvoke走异步路径
+execute_python = StructuredTool.from_function(
+    func=_execute_python,
+    coroutine=_aexecute_python,
+    name="execute_python"
+)
+
 class CodeExecutorTools:
     """代码执行工具类 - 提供工具列表"""
     
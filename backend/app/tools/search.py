@@ -4,7 +4,7 @@
 import os
 from typing import List
 from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 from app.core.config import settings
 
 # 初始化Tavily搜索
@@ -20,8 +20,22 @@ def _init_tavily():
 
 _tavily_instance = _init_tavily()
 
-@tool
-def search_web(query: str) -> str:
+def _format_results(results) -> str:
+    """格式化搜索结果"""
+    if not results:
+        return "未找到相关信息"
+    
+    formatted = []
+    for i, result in enumerate(results[:3], 1):
+        formatted.append(
+            f"{i}. {result.get('title', 'No title')}\n"
+            f"   来源: {result.get('url', 'N/A')}\n"
+            f"   摘要: {result.get('content', 'No content')[:200]}..."
+        )
+    
+    return "\n\n".join(formatted)
+
+def _search_web(query: str) -> str:
     """
     搜索网页获取最新信息
     
@@ -32,25 +46,35 @@ def search_web(query: str) -> str:
         搜索结果摘要
     """
     try:
-        results = _tavily_instance.invoke({"query": query})
-        
-        if not results:
-            return "未找到相关信息"
-        
-        # 格式化结果
-        formatted = []
-        for i, result in enumerate(results[:3], 1):
-            formatted.append(
-                f"{i}. {result.get('title', 'No title')}\n"
-                f"   来源: {result.get('url', 'N/A')}\n"
-                f"   摘要: {result.get('content', 'No content')[:200]}..."
-            )
-        
-        return "\n\n".join(formatted)
-        
+        results = _tavily_instance.api_wrapper.results(
+            query, _tavily_instance.max_results, _tavily_instance.search_depth
+        )
+        return _format_results(results)
     except Exception as e:
         return f"搜索失败: {str(e)}"
 
+async def _asearch_web(query: str) -> str:
+    """
+    search_web的异步实现（不阻塞事件循环）
+
+    直接调用Tavily的API封装而不是工具本身：嵌套的工具调用会产生额外的
+    on_tool_start/on_tool_end事件（tavily_search_results_json），流式接口会重复推送
+    """
+    try:
+        results = await _tavily_instance.api_wrapper.results_async(
+            query, _tavily_instance.max_results, _tavily_instance.search_depth
+        )
+        return _format_results(results)
+    except Exception as e:
+        return f"搜索失败: {str(e)}"
+
+# 同时提供同步和异步实现：graph.invoke走同步路径，graph.ainvoke走异步路径
+search_web = StructuredTool.from_function(
+    func=_search_web,
+    coroutine=_asearch_web,
+    name="search_web"
+)
+
 class SearchTools:
     """搜索工具类 - 提供工具列表"""
     
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+"""
+路由基准测试：用历史决策或标注数据回放，对比各种路由策略
+
+对每种策略输出准确率（以 route_history 的 routed_to 或标注为准）、覆盖率、
+p50/p95 延迟、token 消耗和混淆矩阵。回放期间不写 route_history、不读写任何缓存。
+
+策略:
+    rules       关键词/正则规则（无法确定时视为弃权）
+    embedding   向量路由（用 route_history 建索引，自动排除被评测的消息）
+    structured  结构化输出（含理由）
+    label       标签模式（只输出一个字母）
+    cascade     级联路由（需配置 ROUTER_CASCADE_MODELS）
+
+运行（在 backend 目录下）:
+    python scripts/benchmark_router.py --limit 500
+    python scripts/benchmark_router.py --jsonl data/route_labels.jsonl --strategies rules,label
+    python scripts/benchmark_router.py --offline --stub-latency-ms 300   # 不访问网络，只测延迟
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ALL_STRATEGIES = ["rules", "embedding", "structured", "label", "cascade"]
+ABSTAIN = "-"  # 策略无法确定（交给下一级路由）
+
+
+@dataclass
+class Example:
+    """一条回放样本"""
+    text: str
+    expected: str
+
+
+@dataclass
+class Outcome:
+    """一条样本在某个策略下的结果"""
+    expected: str
+    predicted: Optional[str]  # None表示弃权
+    latency_ms: float
+    tokens: int = 0
+    tier: Optional[str] = None  # 级联路由中做出决策的模型
+    error: Optional[str] = None
+
+
+@dataclass
+class Report:
+    strategy: str
+    outcomes: List[Outcome] = field(default_factory=list)
+
+
+# 一个策略：输入用户消息，返回(路由或None, token数, 级联层级)
+Strategy = Callable[[str], Awaitable[Tuple[Optional[str], int, Optional[str]]]]
+
+
+def load_history(db_path: str, limit: int, all_sources: bool) -> List[Example]:
+    """从 route_history 读取样本（同一条消息只保留最新的决策）"""
+    where = "" if all_sources else "WHERE decided_by IS NULL OR decided_by = 'llm' OR decided_by LIKE 'llm:%'"
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(f"""
+        SELECT user_message, routed_to FROM route_history
+        {where}
+        ORDER BY id DESC
+    """).fetchall()
+    conn.close()
+
+    examples: Dict[str, str] = {}
+    for text, route in rows:
+        if text and text not in examples:
+            examples[text] = route
+        if len(examples) >= limit:
+            break
+    return [Example(text, route) for text, route in examples.items()]
+
+
+def load_jsonl(path: str, limit: int) -> List[Example]:
+    """读取标注数据，每行 {"message": ..., "route": ...}（也接受 user_message / routed_to）"""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            examples.append(Example(
+                text=row.get("message") or row["user_message"],
+                expected=row.get("route") or row["routed_to"]
+            ))
+            if len(examples) >= limit:
+                break
+    return examples
+
+
+def stub_runnable(expected: Dict[str, str], latency_ms: float, with_confidence: bool = False):
+    """
+    离线模式的LLM替身：等待模拟的延迟后返回样本的标注路由
+
+    只用于测量延迟和并发开销，离线结果的准确率没有意义
+    """
+    from langchain_core.runnables import RunnableLambda
+    from app.agents.router import CascadeRouteResponse, RouteResponse
+
+    def respond(inputs):
+        route = expected.get(str(inputs["messages"][-1].content), "general_assistant")
+        if with_confidence:
+            return CascadeRouteResponse(next=route, reasoning="stub", confidence=1.0)
+        return RouteResponse(next=route, reasoning="stub")
+
+    def invoke(inputs):
+        time.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+        return respond(inputs)
+
+    async def ainvoke(inputs):
+        await asyncio.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+        return respond(inputs)
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+
+def build_strategies(args, examples: List[Example]) -> Dict[str, Union[Strategy, str]]:
+    """构造各策略的调用函数（不可用的策略值为说明原因的字符串）"""
+    from langchain_core.messages import HumanMessage
+    from langchain_openai import ChatOpenAI
+
+    from app.agents.embedding_router import EmbeddingRouter
+    from app.agents.router import RouterAgent
+    from app.agents.router_rules import DEFAULT_RULES, RuleRouter
+    from app.core.config import settings
+
+    def create_llm(model: str) -> ChatOpenAI:
+        kwargs = {"model": model, "temperature": 0, "api_key": settings.OPENAI_API_KEY}
+        if settings.OPENAI_BASE_URL:
+            kwargs["base_url"] = settings.OPENAI_BASE_URL
+        return ChatOpenAI(**kwargs)
+
+    if args.offline:
+        # tiktoken首次使用需要下载词表
+        settings.ROUTER_LABEL_LOGIT_BIAS = False
+
+    model = args.model or settings.OPENAI_MODEL
+    cascade_models = [m for m in settings.ROUTER_CASCADE_MODELS if m != model]
+    router = RouterAgent(create_llm(model), cascade=[create_llm(m) for m in cascade_models])
+    expected = {e.text: e.expected for e in examples}
+    if args.offline:
+        router.runnable = stub_runnable(expected, args.stub_latency_ms)
+        router.label_runnable = stub_runnable(expected, args.stub_latency_ms)
+        router.cascade = [
+            (name, stub_runnable(expected, args.stub_latency_ms, with_confidence=True))
+            for name, _ in router.cascade
+        ]
+
+    async def with_tokens(call: Callable[[], Awaitable]) -> Tuple[object, int]:
+        if args.offline:
+            return await call(), 0
+        from langchain_community.callbacks import get_openai_callback
+        with get_openai_callback() as cb:
+            result = await call()
+        return result, cb.total_tokens
+
+    def llm_strategy(runnable) -> Strategy:
+        async def run(text: str):
+            response, tokens = await with_tokens(
+                lambda: runnable.ainvoke({"messages": [HumanMessage(content=text)]})
+            )
+            return response.next, tokens, None
+        return run
+
+    rule_router = RuleRouter(settings.ROUTER_RULES or DEFAULT_RULES)
+
+    async def rules(text: str):
+        match = rule_router.match(text)
+        return (match.route if match else None), 0, None
+
+    async def cascade(text: str):
+        (response, decided_by), tokens = await with_tokens(
+            lambda: router._aroute_llm([HumanMessage(content=text)], None)
+        )
+        return response.next, tokens, decided_by
+
+    strategies: Dict[str, Union[Strategy, str]] = {
+        "rules": rules,
+        "structured": llm_strategy(router.runnable),
+        "label": llm_strategy(router.label_runnable),
+        "cascade": cascade if router.cascade else "未配置 ROUTER_CASCADE_MODELS",
+    }
+
+    if args.offline:
+        strategies["embedding"] = "离线模式不可用（需要调用embedding接口）"
+    else:
+        embedding_router = EmbeddingRouter(
+            enabled=True,
+            method=settings.ROUTER_EMBEDDING_METHOD,
+            k=settings.ROUTER_EMBEDDING_K,
+            threshold=settings.ROUTER_EMBEDDING_THRESHOLD,
+            min_similarity=settings.ROUTER_EMBEDDING_MIN_SIMILARITY,
+            min_examples=settings.ROUTER_EMBEDDING_MIN_EXAMPLES,
+            max_examples=settings.ROUTER_EMBEDDING_MAX_EXAMPLES,
+            rebuild_interval=float("inf")
+        )
+        # 评测样本不参与建索引，否则每条样本都能找到自己
+        load_examples = embedding_router._load_examples
+        embedding_router._load_examples = lambda: [e for e in load_examples() if e[0] not in expected]
+        if embedding_router.rebuild():
+            async def embedding(text: str):
+                match = await embedding_router.aclassify(text)
+                return (match.route if match else None), 0, None
+            strategies["embedding"] = embedding
+        else:
+            strategies["embedding"] = "索引构建失败或样本不足"
+
+    return strategies
+
+
+async def run_strategy(name: str, strategy: Strategy, examples: List[Example], concurrency: int) -> Report:
+    """以有界并发回放所有样本"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(example: Example) -> Outcome:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                predicted, tokens, tier = await strategy(example.text)
+                error = None
+            except Exception as e:
+                predicted, tokens, tier, error = None, 0, None, str(e)
+            latency_ms = (time.perf_counter() - started) * 1000
+            return Outcome(example.expected, predicted, latency_ms, tokens, tier, error)
+
+    outcomes = await asyncio.gather(*(run_one(e) for e in examples))
+    return Report(strategy=name, outcomes=list(outcomes))
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = max(int(len(values) * percent / 100 + 0.5) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def summarize(report: Report) -> dict:
+    """汇总一个策略的指标"""
+    outcomes = report.outcomes
+    answered = [o for o in outcomes if o.predicted is not None]
+    correct = sum(1 for o in answered if o.predicted == o.expected)
+    latencies = [o.latency_ms for o in outcomes if o.error is None]
+
+    confusion: Dict[str, Counter] = defaultdict(Counter)
+    for o in outcomes:
+        confusion[o.expected][o.predicted or ABSTAIN] += 1
+
+    return {
+        "strategy": report.strategy,
+        "samples": len(outcomes),
+        "errors": sum(1 for o in outcomes if o.error),
+        "coverage": round(len(answered) / len(outcomes), 4) if outcomes else 0.0,
+        "accuracy": round(correct / len(answered), 4) if answered else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        },
+        "tokens": {
+            "total": sum(o.tokens for o in outcomes),
+            "per_request": round(sum(o.tokens for o in outcomes) / len(outcomes), 1) if outcomes else 0.0,
+        },
+        "tiers": dict(Counter(o.tier for o in outcomes if o.tier)),
+        "confusion": {expected: dict(row) for expected, row in confusion.items()},
+    }
+
+
+def print_summary(summary: dict, offline: bool) -> None:
+    print(f"\n{'='*60}")
+    print(f"📊 {summary['strategy']}")
+    print(f"{'='*60}")
+    accuracy = "n/a（离线替身）" if offline and summary["strategy"] != "rules" else f"{summary['accuracy']:.2%}"
+    print(f"样本: {summary['samples']}  错误: {summary['errors']}  覆盖率: {summary['coverage']:.2%}  准确率: {accuracy}")
+    latency = summary["latency_ms"]
+    print(f"延迟: p50={latency['p50']}ms  p95={latency['p95']}ms  mean={latency['mean']}ms")
+    print(f"Token: 共{summary['tokens']['total']}，平均每次{summary['tokens']['per_request']}")
+    if summary["tiers"]:
+        print(f"级联决策层级: {summary['tiers']}")
+
+    routes = sorted(summary["confusion"])
+    columns = sorted({p for row in summary["confusion"].values() for p in row} | set(routes))
+    width = max(len(c) for c in columns + ["expected"]) + 2
+    print("\n混淆矩阵（行: 期望，列: 预测）")
+    print("expected".ljust(width) + "".join(c.rjust(width) for c in columns))
+    for expected in routes:
+        row = summary["confusion"][expected]
+        print(expected.ljust(width) + "".join(str(row.get(c, 0)).rjust(width) for c in columns))
+
+
+async def main(args) -> None:
+    if args.jsonl:
+        examples = load_jsonl(args.jsonl, args.limit)
+    else:
+        from app.api.v1.endpoints.router_monitor import DB_PATH
+        examples = load_history(args.db or DB_PATH, args.limit, args.all_sources)
+
+    if not examples:
+        print("❌ 没有可回放的样本")
+        return
+    print(f"📁 样本数: {len(examples)}  并发: {args.concurrency}  {'离线模式' if args.offline else ''}")
+
+    strategies = build_strategies(args, examples)
+    summaries = []
+    for name in args.strategies.split(","):
+        strategy = strategies.get(name.strip())
+        if strategy is None:
+            print(f"⚠️  未知策略: {name}")
+            continue
+        if isinstance(strategy, str):
+            print(f"\n⏭️  跳过 {name}: {strategy}")
+            continue
+        report = await run_strategy(name, strategy, examples, args.concurrency)
+        summary = summarize(report)
+        summaries.append(summary)
+        print_summary(summary, args.offline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 结果已保存: {args.output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="路由策略基准测试")
+    parser.add_argument("--jsonl", help="标注数据（每行 {message, route}），不指定时回放 route_history")
+    parser.add_argument("--db", help="route_history 所在的数据库（默认与路由监控相同）")
+    parser.add_argument("--all-sources", action="store_true", help="包含规则、缓存等非LLM决策的记录")
+    parser.add_argument("--limit", type=int, default=500, help="最多回放的样本数")
+    parser.add_argument("--strategies", default=",".join(ALL_STRATEGIES), help="逗号分隔的策略列表")
+    parser.add_argument("--concurrency", type=int, default=8, help="每个策略的并发请求数")
+    parser.add_argument("--model", help="路由模型（默认 OPENAI_MODEL）")
+    parser.add_argument("--offline", action="store_true", help="使用LLM替身，不访问网络（只测延迟）")
+    parser.add_argument("--stub-latency-ms", type=float, default=300, help="离线模式下替身的平均延迟")
+    parser.add_argument("--output", help="把汇总结果写入JSON文件")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.offline:
+        # 离线模式不需要真实的API Key
+        os.environ.setdefault("OPENAI_API_KEY", "offline")
+    asyncio.run(main(args))